@@ -1,29 +1,55 @@
-import re
+import mmap
+import os
 
-# Regex for extracting triples (subject, predicate, object)
-pattern = re.compile(r'(<[^>]+>|_:[^\s]+)\s+(<[^>]+>)\s+(".*?"(?:\^\^<[^>]+>)?|<[^>]+>|_:[^\s]+)\s+<[^>]+>\s+\.')
+try:
+    import regex as re  # Drop-in alternative regex engine, used when installed
+except ImportError:
+    import re
+
+# Regex for extracting triples (subject, predicate, object), one N-Quad per line.
+# Compiled as bytes and anchored per line so a single finditer() can scan the whole mmap'd file.
+# IRI classes exclude newlines so no match can cross a line. Literals stay lazy (".*?"), like
+# NQ_RE in scripts/build_beam_files.py, so lines with unescaped inner quotes are still kept;
+# plain quantifiers keep the pattern valid under stdlib re on Python < 3.11.
+pattern = re.compile(
+    rb'(?m)^[ \t]*(<[^>\n]+>|_:\S+)[ \t]+(<[^>\n]+>)[ \t]+'
+    rb'(".*?"(?:\^\^<[^>\n]+>)?|<[^>\n]+>|_:\S+)'
+    rb'[ \t]+<[^>\n]+>[ \t]+\.'
+)
 input_file = "parts"  # Path to your large input file from wdc online
 output_file = "triples_1.txt"  # Path to the output file
 
-# Function to process the file in chunks
-def process_large_file(input_file, output_file, chunk_size=100000):
-    with open(input_file, "r", encoding="utf-8") as infile, open(output_file, "w", encoding="utf-8") as outfile:
-        triplets = []
-        for line_count, line in enumerate(infile, start=1):
-            match = pattern.match(line.strip())
-            if match:
-                triplets.append("\t".join(match.groups()))  # Store in tab-separated format
-            # Write to the file in chunks to avoid memory overload
-            if line_count % chunk_size == 0:
-                outfile.write("\n".join(triplets) + "\n")
-                triplets.clear()  # Clear the list to free memory
+# Function to process the file with one regex scan, flushing output in large buffers
+def process_large_file(input_file, output_file, buffer_size=16 << 20):
+    triplet_count = 0
+    with open(output_file, "wb") as outfile:
+        fd = os.open(input_file, os.O_RDONLY)
+        try:
+            if os.fstat(fd).st_size == 0:
+                mm = None
+            else:
+                mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
 
-        # Write any remaining triplets (if any) after the loop ends
-        if triplets:
-            outfile.write("\n".join(triplets) + "\n")
-    
-    print(f"✅ Extraction completed! {line_count} lines processed. Triplets saved to `{output_file}`.")
+        if mm is not None:
+            with mm:
+                buffer = bytearray()
+                for match in pattern.finditer(mm):
+                    buffer += b"\t".join(match.groups())  # Store in tab-separated format
+                    buffer += b"\n"
+                    triplet_count += 1
+                    # Write to the file in large chunks to avoid memory overload
+                    if len(buffer) >= buffer_size:
+                        outfile.write(buffer)
+                        buffer.clear()
 
-# Run the function
-process_large_file(input_file, output_file, chunk_size=100000)
+                # Write any remaining triplets (if any) after the scan ends
+                if buffer:
+                    outfile.write(buffer)
 
+    print(f"✅ Extraction completed! {triplet_count} triplets saved to `{output_file}`.")
+
+# Run the function
+if __name__ == "__main__":
+    process_large_file(input_file, output_file)
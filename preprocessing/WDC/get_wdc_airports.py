@@ -1,28 +1,28 @@
 input_file = "triples_1.txt"  #initial_wdc_triples.txt
 output_file = "wdc_airport_related_triples.txt"
 
-airport_type = "<http://schema.org/Airport>"
+airport_type = b"<http://schema.org/Airport>"  # compared on raw bytes, lines are never decoded
 airport_entities = set()
-all_triples = []
+buffer_size = 1 << 20
 
-# First pass: read and collect all triples, find airport entities
-with open(input_file, "r", encoding="utf-8") as f:
+# First pass: find airport entities (only their subjects are kept in memory)
+with open(input_file, "rb", buffering=buffer_size) as f:
     for line in f:
-        line = line.strip()
-        all_triples.append(line)
-        if line.endswith(airport_type):
-            entity = line.split("\t")[0]
+        if line.rstrip().endswith(airport_type):
+            # Same subject field as the second pass compares
+            entity = line.strip().split(b"\t", 1)[0]
             airport_entities.add(entity)
 
-# Second pass: filter triples that start with airport entities
-relevant_triples = [triple for triple in all_triples if triple.split("\t")[0] in airport_entities]
-
-# Write the output
-with open(output_file, "w", encoding="utf-8") as f:
-    for triple in relevant_triples:
-        f.write(triple + "\n")
+# Second pass: reopen the file and stream triples that start with airport entities
+relevant_count = 0
+with open(input_file, "rb", buffering=buffer_size) as f, \
+     open(output_file, "wb", buffering=buffer_size) as out:
+    for line in f:
+        line = line.strip()
+        if line.split(b"\t", 1)[0] in airport_entities:
+            out.write(line + b"\n")
+            relevant_count += 1
 
 # Print results
 print(f"Number of airport entities found: {len(airport_entities)}")
-print(f"Saved {len(relevant_triples)} relevant triples to {output_file}")
-
+print(f"Saved {relevant_count} relevant triples to {output_file}")
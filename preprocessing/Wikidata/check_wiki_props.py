@@ -1,14 +1,31 @@
 import requests
-import json
-from collections import defaultdict, OrderedDict
+import atexit
+import orjson
+from collections import defaultdict
+from operator import itemgetter
 import os
-import time
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-LABEL_CACHE_FILE = "label_cache_wiki_props.json"
+from wikidata_http import MAX_WORKERS, TokenBucket, request_with_backoff
+
+LABEL_CACHE_FILE = "label_cache_wiki_props.db"
+LEGACY_LABEL_CACHE_FILE = "label_cache_wiki_props.json"
+WRITE_BATCH = int(os.environ.get("WRITE_BATCH", "1000"))  # new labels buffered before each SQLite write
 OUTPUT_FILE = "sorted_wiki_props.json"
 
 USER_AGENT = "YourAppName/1.0 (your.email@example.com) Python script to fetch Wikidata labels"
 
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+WBGETENTITIES_BATCH_SIZE = 50  # API limit of ids per wbgetentities call
+PROP_ID_RE = re.compile(r"^[Pp]\d+$")
+
+# One keep-alive session and rate limiter shared by every Wikidata request of this script
+SESSION = requests.Session()
+SESSION.headers["User-Agent"] = USER_AGENT
+LIMITER = TokenBucket()
+
 
 def get_property_label(prop_url, cache, max_retries=3):
     if prop_url in cache:
@@ -24,33 +41,23 @@ def get_property_label(prop_url, cache, max_retries=3):
           FILTER (lang(?label) = "en")
         }}
         """
-        headers = {"Accept": "application/sparql-results+json", "User-Agent": USER_AGENT}
+        headers = {"Accept": "application/sparql-results+json"}
         timeout = 20  # Increased timeout to 20 seconds
-        retries = 0
         label = "Unknown"
 
-        while retries < max_retries:
-            try:
-                response = requests.get(sparql_url, params={"query": query}, headers=headers, timeout=timeout)
-                response.raise_for_status()
-                data = response.json()
-                results = data.get("results", {}).get("bindings", [])
-                if results:
-                    label = results[0]["label"]["value"]
-                break  # Success, exit retry loop
-            except requests.exceptions.ReadTimeout:
-                retries += 1
-                wait_time = 2 ** retries  # exponential backoff: 2, 4, 8 sec
-                print(f"Read timeout for {prop_id}, retry {retries}/{max_retries} after {wait_time}s")
-                time.sleep(wait_time)
-            except requests.exceptions.HTTPError as e:
-                print(f"Failed to fetch label for {prop_id}: {e}")
-                break
-            except requests.exceptions.RequestException as e:
-                print(f"Request error for {prop_id}: {e}")
-                break
-
-        time.sleep(1)  # Rate limit delay
+        try:
+            response = request_with_backoff(
+                SESSION, "GET", sparql_url, max_retries=max_retries, limiter=LIMITER, label=prop_id,
+                params={"query": query}, headers=headers, timeout=timeout,
+            )
+            data = orjson.loads(response.content)
+            results = data.get("results", {}).get("bindings", [])
+            if results:
+                label = results[0]["label"]["value"]
+        except requests.exceptions.HTTPError as e:
+            print(f"Failed to fetch label for {prop_id}: {e}")
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            print(f"Request error for {prop_id}: {e}")
 
     else:
         label = prop_url
@@ -59,32 +66,121 @@ def get_property_label(prop_url, cache, max_retries=3):
     return label
 
 
+def fetch_label_batch(batch, max_retries=3):
+    """Return {prop_id: label} for one wbgetentities call, or None if the batch failed."""
+    params = {
+        "action": "wbgetentities",
+        "ids": "|".join(batch),
+        "props": "labels",
+        "languages": "en",
+        "format": "json",
+    }
+    timeout = 20
+    label = f"batch {batch[0]}..{batch[-1]}"
+    try:
+        response = request_with_backoff(
+            SESSION, "GET", WIKIDATA_API_URL, max_retries=max_retries, limiter=LIMITER, label=label,
+            params=params, timeout=timeout,
+        )
+        entities = orjson.loads(response.content).get("entities", {})
+    except requests.exceptions.HTTPError as e:
+        print(f"Failed to fetch labels for {label}: {e}")
+        return None
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+        print(f"Request error for {label}: {e}")
+        return None
+    return {
+        prop_id: entities.get(prop_id, {}).get("labels", {}).get("en", {}).get("value", "Unknown")
+        for prop_id in batch
+    }
+
+
+def fetch_property_labels(prop_urls, cache, max_retries=3):
+    """Fill the cache for uncached Wikidata properties, 50 ids per wbgetentities call."""
+    id_to_urls = defaultdict(list)
+    for prop_url in prop_urls:
+        if prop_url in cache:
+            continue
+        if "wikidata.org/prop/direct/" in prop_url or "wikidata.org/prop/" in prop_url:
+            prop_id = prop_url.rstrip('/').split('/')[-1]
+            if PROP_ID_RE.match(prop_id):
+                id_to_urls[prop_id.upper()].append(prop_url)
+
+    ids = list(id_to_urls)
+    batches = [ids[i:i + WBGETENTITIES_BATCH_SIZE] for i in range(0, len(ids), WBGETENTITIES_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(fetch_label_batch, batch, max_retries) for batch in batches]
+        for future in as_completed(futures):
+            labels = future.result()
+            # Failed batches stay uncached so get_property_label can fall back to per-property queries
+            if not labels:
+                continue
+            for prop_id, label in labels.items():
+                for prop_url in id_to_urls[prop_id]:
+                    cache[prop_url] = label
+
+
+class LabelCache:
+    """In-memory url -> label dict loaded from SQLite, written through in batches of WRITE_BATCH."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS lbl(url TEXT PRIMARY KEY, label TEXT)")
+        self.labels = dict(self.conn.execute("SELECT url, label FROM lbl"))
+        self.pending = []
+        atexit.register(self.flush)
+
+    def __contains__(self, prop_url):
+        return prop_url in self.labels
+
+    def __getitem__(self, prop_url):
+        return self.labels[prop_url]
+
+    def __setitem__(self, prop_url, label):
+        self.labels[prop_url] = label
+        self.pending.append((prop_url, label))
+        if len(self.pending) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.conn.executemany("INSERT OR REPLACE INTO lbl VALUES(?, ?)", self.pending)
+            self.conn.commit()
+            self.pending.clear()
+
+
 def load_label_cache():
-    if os.path.exists(LABEL_CACHE_FILE):
-        with open(LABEL_CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    cache = LabelCache(LABEL_CACHE_FILE)
+    # One-time import of the JSON cache written by earlier versions of this script
+    if not cache.labels and os.path.exists(LEGACY_LABEL_CACHE_FILE):
+        with open(LEGACY_LABEL_CACHE_FILE, "rb") as f:
+            for prop_url, label in orjson.loads(f.read()).items():
+                cache[prop_url] = label
+    return cache
 
 def save_label_cache(cache):
-    with open(LABEL_CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
+    cache.flush()
 
 
-def process_triples(file_path):
+def count_props_by_line(file_path):
     prop_count = defaultdict(int)
-
-    print("Counting properties in file...")
     with open(file_path, "r", encoding="utf-8") as f:
         for line in f:
             parts = line.strip().split("\t")
             if len(parts) == 3:
-                prop = parts[1]
-                prop_count[prop] += 1
+                prop_count[parts[1]] += 1
+    return prop_count
+
+
+def process_triples(file_path):
+    print("Counting properties in file...")
+    prop_count = count_props_by_line(file_path)
 
     label_cache = load_label_cache()
     final_dict = {}
 
     print("Fetching labels (from cache or Wikidata)...")
+    fetch_property_labels(prop_count.keys(), label_cache)
     for prop, count in prop_count.items():
         label = get_property_label(prop, label_cache)
         final_dict[prop] = [count, label]
@@ -92,10 +188,11 @@ def process_triples(file_path):
     save_label_cache(label_cache)
 
     print("Sorting properties by frequency...")
-    sorted_dict = OrderedDict(sorted(final_dict.items(), key=lambda x: x[1][0]))
+    # Sort the (prop, count) pairs with a C-level key; a plain dict keeps the sorted order
+    sorted_dict = {prop: final_dict[prop] for prop, _count in sorted(prop_count.items(), key=itemgetter(1))}
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as out_f:
-        json.dump(sorted_dict, out_f, indent=2, ensure_ascii=False)
+    with open(OUTPUT_FILE, "wb") as out_f:
+        out_f.write(orjson.dumps(sorted_dict, option=orjson.OPT_INDENT_2))
 
     print(f"Done! Results saved to '{OUTPUT_FILE}'")
     return sorted_dict
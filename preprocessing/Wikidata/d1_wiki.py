@@ -1,22 +1,31 @@
+import atexit
 import os
-import time
-import json
+import orjson
 import re
-from SPARQLWrapper import SPARQLWrapper, JSON, POST
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from wikidata_http import MAX_WORKERS, TokenBucket, request_with_backoff
 
 WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
 USER_AGENT = "EntityEnricher/1.0 (https://yourdomain.example)"
-sparql = SPARQLWrapper(WIKIDATA_ENDPOINT)
-sparql.setReturnFormat(JSON)
-sparql.addCustomHttpHeader("User-Agent", USER_AGENT)
-sparql.setMethod(POST)  # Ensure POST method is used
 
 INPUT_FILES = ["attribute_wd_filtered.txt", "relational_wd_filtered.txt"]
 OUTPUT_FILE = "wd_d1_entity_labels_descriptions.txt"
-CACHE_FILE = "wd_d1_entity_labeldesc_cache.json"
+PARTIAL_FILE = OUTPUT_FILE + ".partial"  # write-ahead log of fetched triples not yet checkpointed
+FAILED_FILE = OUTPUT_FILE + ".failed"  # URIs of batches that failed even at size 1, one per line
+CACHE_FILE = "wd_d1_entity_labeldesc_cache.db"
+LEGACY_CACHE_FILE = "wd_d1_entity_labeldesc_cache.json"
+WRITE_BATCH = int(os.environ.get("WRITE_BATCH", "1000"))  # entries buffered before each SQLite write
 
-BATCH_SIZE = 50
-SLEEP_BETWEEN_REQUESTS = 2  # seconds
+BATCH_SIZE = 200  # halved on the fly when WDQS rejects or times out on a batch
+# Payload too large, plus the 500/504 WDQS answers with when a query hits its 60 s limit
+SPLIT_STATUSES = {413, 414, 500, 504}
+QNAME_PREFIXES = {"entity": "wd", "prop/direct": "wdt"}
+QNAME_RE = re.compile(r"http://www\.wikidata\.org/(entity|prop/direct)/([A-Za-z][0-9A-Za-z]*)$")
+CHECKPOINT_EVERY = 10  # batches between cache checkpoints
 
 
 def extract_wikidata_uris(files):
@@ -42,58 +51,164 @@ def chunked(iterable, size):
         yield iterable[i:i+size]
 
 
-def fetch_labels_descriptions(uris):
+def sparql_term(uri):
+    """Compact entity/direct-property IRIs to wd:/wdt: names to shrink the query payload."""
+    m = QNAME_RE.match(uri)
+    if m:
+        return f"{QNAME_PREFIXES[m.group(1)]}:{m.group(2)}"
+    return f"<{uri}>"
+
+
+def fetch_batch(idx, batch, session, limiter):
+    """Fetch label/description triples for a batch; returns (triples, URIs that could not be fetched)."""
+    print(f"\n[Batch {idx + 1}] Processing batch of size {len(batch)}")
+    values = " ".join(map(sparql_term, batch))
+    query = f"""
+    PREFIX wd: <http://www.wikidata.org/entity/>
+    PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+    SELECT ?s ?label ?desc WHERE {{
+      VALUES ?s {{ {values} }}
+      OPTIONAL {{ ?s rdfs:label ?label FILTER(LANG(?label) = "en") }}
+      OPTIONAL {{ ?s schema:description ?desc FILTER(LANG(?desc) = "en") }}
+    }}
+    """
     triples = []
-    for idx, batch in enumerate(chunked(uris, BATCH_SIZE)):
-        print(f"\n[Batch {idx + 1}] Processing batch of size {len(batch)}")
-        values = " ".join(f"<{uri}>" for uri in batch)
-        query = f"""
-        SELECT ?s ?label ?desc WHERE {{
-          VALUES ?s {{ {values} }}
-          OPTIONAL {{ ?s rdfs:label ?label FILTER(LANG(?label) = "en") }}
-          OPTIONAL {{ ?s schema:description ?desc FILTER(LANG(?desc) = "en") }}
-        }}
-        """
-        retries = 3
-        while retries > 0:
-            try:
-                local_sparql = SPARQLWrapper(WIKIDATA_ENDPOINT)
-                local_sparql.setReturnFormat(JSON)
-                local_sparql.addCustomHttpHeader("User-Agent", USER_AGENT)
-                local_sparql.setMethod(POST)
-                local_sparql.setQuery(query)
-
-                results = local_sparql.query().convert()
-                bindings = results["results"]["bindings"]
-                print(f"Fetched {len(bindings)} results in this batch")
-
-                for result in bindings:
-                    s = result["s"]["value"]
-                    if "label" in result:
-                        label = result["label"]["value"]
-                        triples.append((s, "http://www.w3.org/2000/01/rdf-schema#label", f'"{label}"'))
-                    if "desc" in result:
-                        desc = result["desc"]["value"]
-                        triples.append((s, "http://schema.org/description", f'"{desc}"'))
-                break  # success
-            except Exception as e:
-                print(f"Error fetching batch, retrying... ({e})")
-                retries -= 1
-                time.sleep(SLEEP_BETWEEN_REQUESTS * 2)
-        time.sleep(SLEEP_BETWEEN_REQUESTS)
-    return triples
+    try:
+        response = request_with_backoff(
+            session, "POST", WIKIDATA_ENDPOINT, limiter=limiter, label=f"batch {idx + 1}",
+            # A batch that can still be split is retried once on a timeout, then split
+            timeout_retries=1 if len(batch) > 1 else None,
+            data={"query": query}, timeout=60,
+        )
+        bindings = orjson.loads(response.content)["results"]["bindings"]
+    except (requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+        status = e.response.status_code if e.response is not None else None
+        if len(batch) > 1 and (status in SPLIT_STATUSES or isinstance(e, requests.exceptions.Timeout)):
+            # Query too large or too slow for WDQS: retry both halves separately
+            half = len(batch) // 2
+            print(f"[Batch {idx + 1}] {e}; splitting into two batches of {half} and {len(batch) - half}")
+            first, first_failed = fetch_batch(idx, batch[:half], session, limiter)
+            second, second_failed = fetch_batch(idx, batch[half:], session, limiter)
+            return first + second, first_failed + second_failed
+        print(f"[Batch {idx + 1}] Error fetching batch, giving up on {len(batch)} URIs ({e})")
+        return triples, list(batch)
+    except Exception as e:
+        print(f"[Batch {idx + 1}] Error fetching batch, giving up on {len(batch)} URIs ({e})")
+        return triples, list(batch)
+    print(f"[Batch {idx + 1}] Fetched {len(bindings)} results in this batch")
+
+    for result in bindings:
+        s = result["s"]["value"]
+        if "label" in result:
+            label = result["label"]["value"]
+            triples.append((s, "http://www.w3.org/2000/01/rdf-schema#label", f'"{label}"'))
+        if "desc" in result:
+            desc = result["desc"]["value"]
+            triples.append((s, "http://schema.org/description", f'"{desc}"'))
+    return triples, []
+
+
+def cache_triple(cache, s, p, o):
+    if p.endswith("label"):
+        cache.set_field(s, "label", o)
+    elif p.endswith("description"):
+        cache.set_field(s, "description", o)
+
+
+def fetch_labels_descriptions(uris, cache):
+    """Fetch batches into the cache, checkpointing every CHECKPOINT_EVERY batches.
+
+    Returns the triple count and the URIs whose batches failed.
+    """
+    fetched = 0
+    failed = []
+    limiter = TokenBucket()
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, \
+            open(PARTIAL_FILE, "ab") as partial:
+        session.headers.update({"User-Agent": USER_AGENT, "Accept": "application/sparql-results+json"})
+        futures = [
+            executor.submit(fetch_batch, idx, batch, session, limiter)
+            for idx, batch in enumerate(chunked(uris, BATCH_SIZE))
+        ]
+        for done, future in enumerate(futures, start=1):
+            triples, batch_failed = future.result()
+            failed.extend(batch_failed)
+            for triple in triples:
+                partial.write(orjson.dumps(triple) + b"\n")
+                cache_triple(cache, *triple)
+            partial.flush()
+            fetched += len(triples)
+            if done % CHECKPOINT_EVERY == 0:
+                save_cache(cache)
+                partial.truncate(0)
+    return fetched, failed
+
+
+class EntityCache:
+    """In-memory uri -> {"label", "description"} dict loaded from SQLite, written through in batches."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ent(uri TEXT PRIMARY KEY, label TEXT, description TEXT)")
+        self.entries = {}
+        for uri, label, description in self.conn.execute("SELECT uri, label, description FROM ent"):
+            info = self.entries[uri] = {}
+            if label is not None:
+                info["label"] = label
+            if description is not None:
+                info["description"] = description
+        self.dirty = set()
+        atexit.register(self.flush)
+
+    def __contains__(self, uri):
+        return uri in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self):
+        return self.entries.items()
+
+    def set_field(self, uri, field, value):
+        self.entries.setdefault(uri, {})[field] = value
+        self.dirty.add(uri)
+        if len(self.dirty) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.dirty:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ent VALUES(?, ?, ?)",
+                ((uri, self.entries[uri].get("label"), self.entries[uri].get("description")) for uri in self.dirty),
+            )
+            self.conn.commit()
+            self.dirty.clear()
 
 
 def load_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    cache = EntityCache(CACHE_FILE)
+    # One-time import of the JSON cache written by earlier versions of this script
+    if not len(cache) and os.path.exists(LEGACY_CACHE_FILE):
+        with open(LEGACY_CACHE_FILE, "rb") as f:
+            for uri, info in orjson.loads(f.read()).items():
+                for field, value in info.items():
+                    cache.set_field(uri, field, value)
+    # Replay triples fetched after the last checkpoint of an interrupted run
+    if os.path.exists(PARTIAL_FILE):
+        with open(PARTIAL_FILE, "rb") as f:
+            for line in f:
+                try:
+                    s, p, o = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    break  # torn last line
+                cache_triple(cache, s, p, o)
+        save_cache(cache)
+        os.remove(PARTIAL_FILE)
+    return cache
 
 
 def save_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
+    cache.flush()
 
 
 def main():
@@ -110,20 +225,17 @@ def main():
     if not uris_to_query:
         print("✅ Nothing to query. All URIs are already cached.")
     else:
-        new_triples = fetch_labels_descriptions(uris_to_query)
-        print(f"✅ Total new triples fetched: {len(new_triples)}")
-
-        # Update cache
-        for s, p, o in new_triples:
-            if s not in cache:
-                cache[s] = {}
-            if p.endswith("label"):
-                cache[s]["label"] = o
-            elif p.endswith("description"):
-                cache[s]["description"] = o
+        new_triples, failed = fetch_labels_descriptions(uris_to_query, cache)
+        print(f"✅ Total new triples fetched: {new_triples}")
+        if failed:
+            # Not cached, so a rerun queries them again
+            with open(FAILED_FILE, "w", encoding="utf-8") as f:
+                f.writelines(uri + "\n" for uri in failed)
+            print(f"⚠️  {len(failed)} URIs could not be fetched; listed in {FAILED_FILE}")
 
         print(f"💾 Saving updated cache (size: {len(cache)})")
         save_cache(cache)
+        os.remove(PARTIAL_FILE)
 
     print(f"📝 Writing triples to {OUTPUT_FILE}...")
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
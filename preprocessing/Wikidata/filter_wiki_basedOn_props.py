@@ -27,18 +27,18 @@ for prop, (count, label) in sorted_props.items():
     elif count <= 3487 and label not in exceptions:
         props_to_remove.add(prop)
 
+props_to_remove = frozenset(props_to_remove)
 print(f"Total properties to remove: {len(props_to_remove)}")
 
 # Step 3: Define a function to filter files
 def filter_file(input_path, output_path, props_to_remove):
-    with open(input_path, 'r', encoding='utf-8') as infile, \
-         open(output_path, 'w', encoding='utf-8') as outfile:
+    with open(input_path, 'r', encoding='utf-8', buffering=1 << 20) as infile, \
+         open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as outfile:
         for line in infile:
-            parts = line.strip().split('\t')
-            if len(parts) >= 2:
-                prop = parts[1]
-                if prop not in props_to_remove:
-                    outfile.write(line)
+            # Only split off the predicate column; the line is written verbatim
+            parts = line.rstrip().split('\t', 2)
+            if len(parts) >= 2 and parts[1] not in props_to_remove:
+                outfile.write(line)
 
 # Step 4: Filter both files
 filter_file('attribute_wd.txt', 'attribute_wd_filtered.txt', props_to_remove)
@@ -1,3 +1,7 @@
+import gc
+import io
+import re
+import tempfile
 from collections import defaultdict
 
 # Input files
@@ -6,17 +10,29 @@ rel_triples_file = "rel_triples_2_lower"
 output_attr_file = "attr_triples_wd_lower_normalized"
 output_rel_file = "rel_triples_2_lower_normalized"
 
-# Step 1: Extract IATA code → subject ID mapping
+# Matches both .../prop/p238 and .../prop/direct/p238 (IATA code) in one scan of the raw line
+IATA_PROP_RE = re.compile(rb"http://www\.wikidata\.org/prop/(?:direct/)?p238")
+
+# Step 1: Extract IATA code → subject ID mapping.
+# The input is read only once: every line is also staged to a local temp file that step 3 rewrites.
 iata_to_subjects = defaultdict(set)
+staged = tempfile.TemporaryFile("w+b")
 
-with open(wikidata_file, "r", encoding="utf-8") as f:
-    for line in f:
-        if "http://www.wikidata.org/prop/p238" in line or "http://www.wikidata.org/prop/direct/p238" in line:
-            parts = line.strip().split("\t")
-            if len(parts) >= 3:
-                subject = parts[0].strip()
-                iata_code = parts[2].strip().strip('"')
-                iata_to_subjects[iata_code].add(subject)
+# The per-code sets only ever grow; keep the cyclic GC from rescanning them during ingest
+gc.disable()
+try:
+    with open(wikidata_file, "rb") as f:
+        for line in f:
+            staged.write(line)
+            if IATA_PROP_RE.search(line):
+                parts = line.decode("utf-8").strip().split("\t")
+                if len(parts) >= 3:
+                    subject = parts[0].strip()
+                    iata_code = parts[2].strip().strip('"')
+                    iata_to_subjects[iata_code].add(subject)
+finally:
+    gc.enable()
+    gc.collect()
 
 # Step 2: Build replacement mapping
 replacement_map = {}
@@ -31,25 +47,32 @@ print("🔁 Replacement mapping:")
 for k, v in replacement_map.items():
     print(f"{k} → {v}")
 
-# Helper function to replace subject IDs
-def replace_subjects_in_line(line, mapping):
-    for old, new in mapping.items():
-        if old in line:
-            line = line.replace(old, new)
-    return line
+# Helper function to replace subject IDs: exact lookups on the subject and object columns,
+# so an ID is never rewritten inside a longer one (q12 in q123)
+lookup = replacement_map.get
+
+def replace_subjects_in_line(line):
+    body = line.rstrip("\n")
+    parts = body.split("\t", 2)
+    if len(parts) < 3:
+        return line
+    s, p, o = parts
+    # Keys are stripped IDs (see step 1); the line keeps its own ending, if any
+    return f"{lookup(s.strip(), s)}\t{p}\t{lookup(o.strip(), o)}{line[len(body):]}"
 
-# Step 3: Replace in attr_triples_wd_lower
-with open(wikidata_file, "r", encoding="utf-8") as fin, \
+# Step 3: Replace in attr_triples_wd_lower (from the staged copy)
+staged.seek(0)
+with io.TextIOWrapper(staged, encoding="utf-8") as fin, \
      open(output_attr_file, "w", encoding="utf-8") as fout:
     for line in fin:
-        new_line = replace_subjects_in_line(line, replacement_map)
+        new_line = replace_subjects_in_line(line)
         fout.write(new_line)
 
 # Step 4: Replace in rel_triples_2_lower
 with open(rel_triples_file, "r", encoding="utf-8") as fin, \
      open(output_rel_file, "w", encoding="utf-8") as fout:
     for line in fin:
-        new_line = replace_subjects_in_line(line, replacement_map)
+        new_line = replace_subjects_in_line(line)
         fout.write(new_line)
 
 print("\n✅ Normalization complete. Output saved to:")
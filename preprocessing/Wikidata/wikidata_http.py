@@ -0,0 +1,90 @@
+import random
+import threading
+import time
+
+import requests
+
+# WDQS allows at most 5 parallel queries per client
+MAX_WORKERS = 5
+REQUESTS_PER_SECOND = 1.0
+
+# Statuses worth retrying: throttling and transient gateway/server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses WDQS also returns when the query itself is too heavy (its 60 s timeout)
+QUERY_TIMEOUT_STATUSES = {500, 504}
+BACKOFF_BASE = 1.0  # seconds, doubled on every attempt
+BACKOFF_JITTER = 1.0  # seconds, uniform random extra wait so workers don't retry in lockstep
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def retry_after_seconds(response, default):
+    """Seconds to wait from a 429/503 Retry-After header, or `default` if absent/unparseable."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return default
+
+
+def backoff_seconds(attempt, response=None):
+    """Exponential backoff for `attempt` (0-based), at least the server's Retry-After, plus jitter."""
+    wait = BACKOFF_BASE * 2 ** attempt
+    if response is not None:
+        wait = max(wait, retry_after_seconds(response, 0))
+    return wait + random.uniform(0, BACKOFF_JITTER)
+
+
+def request_with_backoff(
+    session, method, url, max_retries=3, limiter=None, label="request", timeout_retries=None, **kwargs
+):
+    """
+    Send a request, retrying throttled/transient failures; raises once retries are exhausted.
+    `timeout_retries` caps the retries of query timeouts (500/504, client Timeout) for callers
+    that would rather split the query than resend it whole.
+    """
+    if timeout_retries is None:
+        timeout_retries = max_retries
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+            limit = timeout_retries if response.status_code in QUERY_TIMEOUT_STATUSES else max_retries
+            if response.status_code not in RETRY_STATUSES or attempt >= limit:
+                response.raise_for_status()
+                return response
+            wait = backoff_seconds(attempt, response)
+            reason = f"HTTP {response.status_code}"
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            limit = timeout_retries if isinstance(e, requests.exceptions.Timeout) else max_retries
+            if attempt >= limit:
+                raise
+            wait = backoff_seconds(attempt)
+            reason = type(e).__name__
+        attempt += 1
+        print(f"{reason} for {label}, retry {attempt}/{limit} after {wait:.1f}s")
+        time.sleep(wait)
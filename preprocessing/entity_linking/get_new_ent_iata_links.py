@@ -1,49 +1,77 @@
+import os
+import re
+import subprocess
+import tempfile
+from itertools import groupby
+
 wdc_file = "cleaned_output_wdc_triples_with_iata_filtered.txt"
 wikidata_file = "attr_triples_wikidata_lower_normalized"
 output_file = "ent_links"
 
-# Step 1: Collect IATA codes and their subjects from both files
-def extract_iata_wdc_subjects(file_path):
-    iata_to_subjects = {}
-    with open(file_path, "r", encoding="utf-8") as f:
+# Predicate detectors run once per raw line; only matching lines get decoded and split
+WDC_IATA_RE = re.compile(rb"<http://schema\.org/iatacode>", re.IGNORECASE)
+WD_IATA_RE = re.compile(rb"http://www\.wikidata\.org/prop/(?:direct/)?p238")
+
+# Step 1: Write "code<TAB>subject" pairs from both files, then sort/dedupe them on disk
+def extract_iata_wdc_subjects(file_path, out):
+    with open(file_path, "rb") as f:
         for line in f:
-            line = line.lower()  # Convert line to lowercase
-            if "<http://schema.org/iatacode>" in line:
-                parts = line.strip().split("\t")
+            if WDC_IATA_RE.search(line):
+                parts = line.decode("utf-8").strip().split("\t")
                 if len(parts) >= 3:
-                    subject = parts[0].strip()
-                    code = parts[2].strip().strip('"')
-                    if code not in iata_to_subjects:
-                        iata_to_subjects[code] = set()
-                    iata_to_subjects[code].add(subject)
-    return iata_to_subjects
-
-def extract_iata_wc_subjects(file_path):
-    iata_to_subjects = {}
-    with open(file_path, "r", encoding="utf-8") as f:
+                    # Only the two columns that are written out get lowercased
+                    subject = parts[0].strip().lower()
+                    code = parts[2].strip().strip('"').lower()
+                    out.write(f"{code}\t{subject}\n")
+
+def extract_iata_wc_subjects(file_path, out):
+    with open(file_path, "rb") as f:
         for line in f:
             #line = line.lower()  # Convert line to lowercase
-            if "http://www.wikidata.org/prop/p238" in line or "http://www.wikidata.org/prop/direct/p238" in line:
-                parts = line.strip().split("\t")
+            if WD_IATA_RE.search(line):
+                parts = line.decode("utf-8").strip().split("\t")
                 if len(parts) >= 3:
                     subject = parts[0].strip()
                     code = parts[2].strip().strip('"')
-                    if code not in iata_to_subjects:
-                        iata_to_subjects[code] = set()
-                    iata_to_subjects[code].add(subject)
-    return iata_to_subjects
-
-# Extract subjects by IATA code from both files
-wdc_iata_map = extract_iata_wdc_subjects(wdc_file)
-wikidata_iata_map = extract_iata_wc_subjects(wikidata_file)
-
-# Step 2: Match on common IATA codes and write pairs
-with open(output_file, "w", encoding="utf-8") as out:
-    for iata_code in wdc_iata_map:
-        if iata_code in wikidata_iata_map:
-            for wdc_subj in wdc_iata_map[iata_code]:
-                for wd_subj in wikidata_iata_map[iata_code]:
-                    out.write(f"{wdc_subj}\t{wd_subj}\n")
+                    out.write(f"{code}\t{subject}\n")
 
-print(f"✅ Entity linking complete. Results saved to {output_file}")
+def sort_pairs(path):
+    # External sort keeps memory constant; byte order (LC_ALL=C) matches Python str comparison
+    env = dict(os.environ, LC_ALL="C")
+    subprocess.run(["sort", "-u", "-S", "2G", "-o", path, path], env=env, check=True)
+
+def iata_blocks(path):
+    with open(path, "r", encoding="utf-8") as f:
+        pairs = (line.rstrip("\n").split("\t", 1) for line in f)
+        for code, group in groupby(pairs, key=lambda pair: pair[0]):
+            yield code, [subject for _code, subject in group]
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    wdc_sorted = os.path.join(tmp_dir, "wdc_sorted")
+    wd_sorted = os.path.join(tmp_dir, "wd_sorted")
+    with open(wdc_sorted, "w", encoding="utf-8") as out:
+        extract_iata_wdc_subjects(wdc_file, out)
+    with open(wd_sorted, "w", encoding="utf-8") as out:
+        extract_iata_wc_subjects(wikidata_file, out)
+    sort_pairs(wdc_sorted)
+    sort_pairs(wd_sorted)
 
+    # Step 2: Merge-join on IATA code; the cross product is only built inside one code block
+    with open(output_file, "w", encoding="utf-8") as out:
+        wdc_blocks = iata_blocks(wdc_sorted)
+        wd_blocks = iata_blocks(wd_sorted)
+        wdc_block = next(wdc_blocks, None)
+        wd_block = next(wd_blocks, None)
+        while wdc_block is not None and wd_block is not None:
+            if wdc_block[0] < wd_block[0]:
+                wdc_block = next(wdc_blocks, None)
+            elif wdc_block[0] > wd_block[0]:
+                wd_block = next(wd_blocks, None)
+            else:
+                for wdc_subj in wdc_block[1]:
+                    for wd_subj in wd_block[1]:
+                        out.write(f"{wdc_subj}\t{wd_subj}\n")
+                wdc_block = next(wdc_blocks, None)
+                wd_block = next(wd_blocks, None)
+
+print(f"✅ Entity linking complete. Results saved to {output_file}")
@@ -12,18 +12,57 @@ import argparse
 import os
 import re
 import gzip
+import json
+import mmap
 import shutil
+import tempfile
+import time
 import requests
 import unicodedata
 from pathlib import Path
-from collections import defaultdict
-from SPARQLWrapper import SPARQLWrapper, JSON
+from bisect import bisect_left
+from array import array
+from itertools import islice
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Décompresseurs optionnels plus rapides que zlib (rapidgzip: multi-thread, isal: SIMD)
+try:
+    import rapidgzip
+except ImportError:
+    rapidgzip = None
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+# Parseur JSON en flux optionnel pour les gros résultats SPARQL
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 # Configuration
+DOWNLOAD_WORKERS = 8
+PARTS_CACHE_TTL = 24 * 3600  # secondes
+WRITE_BUFFER = 4 << 20  # octets, buffer des fichiers filtrés
+WRITE_BATCH_ROWS = 10000  # lignes jointes par write() à l'export
+PROGRESS_MASK = 0x3FFF  # horloge consultée toutes les 16384 itérations
+PROGRESS_INTERVAL = 0.1  # secondes minimum entre deux affichages de progression
 WDC_BASE_URL = "https://data.dws.informatik.uni-mannheim.de/structureddata/2024-12/quads/classspecific/"
 WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+USER_AGENT = "WDC-Entity-Linker/1.0 (BEAM benchmark; https://github.com/billalelhachlaf/BEAM-Benchmark-fork)"
+
+# Session HTTP partagée: connexions keep-alive réutilisées + retries sur erreurs transitoires
+_SESSION = requests.Session()
+_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=_RETRY))
+_SESSION.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=_RETRY))
 
 # Colors
 class Colors:
@@ -37,6 +76,17 @@ class Colors:
 def print_color(text, color):
     print(f"{color}{text}{Colors.RESET}")
 
+# Normalisation ASCII rapide (str ou bytes): minuscules + suppression des non-alphanumériques en un seul translate
+_ASCII_LOWER = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"abcdefghijklmnopqrstuvwxyz")
+_ASCII_NON_ALNUM = bytes(c for c in range(256) if not (48 <= c <= 57 or 65 <= c <= 90 or 97 <= c <= 122))
+
+_ASCII_NOT_LOWER_ALNUM = bytes(c for c in range(256) if not (48 <= c <= 57 or 97 <= c <= 122))
+_QID_RE = re.compile(r'^[Qq]\d+$')
+_PID_RE = re.compile(r'^[Pp]\d+$')
+_PART_RE = re.compile(r'part_(\d+)\.gz$')
+_PART_HREF_RE = re.compile(rb'''href=["']?(part_\d+\.gz)["'\s>]''')
+
+@lru_cache(maxsize=1 << 16)
 def normalize_for_matching(text):
     """
     Normalisation agressive pour matching:
@@ -47,14 +97,28 @@ def normalize_for_matching(text):
     """
     if not text:
         return ""
+    # Cas le plus fréquent (IRIs, ISRC...): texte ASCII, pas d'accents → un seul translate en C
+    if text.isascii():
+        return text.encode('ascii').translate(_ASCII_LOWER, _ASCII_NON_ALNUM).decode('ascii')
     # 1) Lowercase
     text = text.lower()
-    # 2) Remove accents/diacritics (NFKD)
-    text = unicodedata.normalize("NFKD", text)
-    text = "".join(ch for ch in text if not unicodedata.combining(ch))
-    # 3) Keep only a-z0-9
-    return re.sub(r'[^a-z0-9]', '', text)
+    # 2) Remove accents/diacritics (NFKD): les marques combinantes ne sont pas ASCII,
+    #    encode('ascii', 'ignore') les supprime avec le reste du non-ASCII
+    raw = unicodedata.normalize("NFKD", text).encode('ascii', 'ignore')
+    # 3) Keep only a-z0-9 (pas de passage en minuscules ici: NFKD peut produire des majuscules, ex. ℌ → H)
+    return raw.translate(None, _ASCII_NOT_LOWER_ALNUM).decode('ascii')
+
+@lru_cache(maxsize=1 << 16)
+def normalize_bytes_for_matching(raw):
+    """
+    Équivalent de normalize_for_matching() sur bytes UTF-8.
+    Chemin rapide ASCII via translate; sinon décodage + normalisation complète (accents).
+    """
+    if raw.isascii():
+        return raw.translate(_ASCII_LOWER, _ASCII_NON_ALNUM)
+    return normalize_for_matching(raw.decode('utf-8', errors='ignore')).encode('ascii')
 
+@lru_cache(maxsize=1 << 16)
 def normalize_country_code(isrc_normalized):
     """
     Normalise les codes pays non-standards dans les ISRC
@@ -100,7 +164,7 @@ def normalize_wkd_class(wkd_class):
         return wkd_class
     if wkd_class.startswith("wdt:Q"):
         return "wd:" + wkd_class.split("wdt:", 1)[1]
-    if re.match(r'^[Qq]\d+$', wkd_class):
+    if _QID_RE.match(wkd_class):
         return "wd:" + wkd_class.upper()
     return wkd_class
 
@@ -118,30 +182,35 @@ def normalize_wikidata_property(wikidata_property):
         return wikidata_property
     if wikidata_property.startswith("http://") or wikidata_property.startswith("https://"):
         return f"<{wikidata_property}>"
-    if re.match(r'^[Pp]\d+$', wikidata_property):
+    if _PID_RE.match(wikidata_property):
         return "wdt:" + wikidata_property.upper()
     return wikidata_property
 
-def discover_parts(class_name):
-    """Découvre les parts disponibles pour une classe"""
+def discover_parts(class_name, work_dir=None):
+    """Découvre les parts disponibles pour une classe (liste mise en cache PARTS_CACHE_TTL secondes)"""
     url = urljoin(WDC_BASE_URL, f"{class_name}/")
+    cache_file = Path(work_dir or Path("Download") / class_name) / ".parts_cache.json"
     
     print_color(f"🔍 Découverte des parts disponibles pour {class_name}...", Colors.BLUE)
     print(f"   URL: {url}")
     
+    if cache_file.exists() and time.time() - cache_file.stat().st_mtime < PARTS_CACHE_TTL:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            parts = json.load(f)
+        print_color(f"✅ {len(parts)} parts trouvées (cache {cache_file.name})", Colors.GREEN)
+        return parts
+    
     try:
-        response = requests.get(url, timeout=30)
+        response = _SESSION.get(url, timeout=30)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        parts = []
+        # Index Apache: un simple findall sur les href bruts, sans construire de DOM
+        parts = list(dict.fromkeys(href.decode() for href in _PART_HREF_RE.findall(response.content)))
+        parts.sort(key=lambda x: int(_PART_RE.match(x).group(1)))
         
-        for link in soup.find_all('a'):
-            href = link.get('href', '')
-            if re.match(r'part_\d+\.gz$', href):
-                parts.append(href)
-        
-        parts.sort(key=lambda x: int(re.search(r'\d+', x).group()))
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(parts, f)
         
         print_color(f"✅ {len(parts)} parts trouvées", Colors.GREEN)
         return parts
@@ -180,29 +249,53 @@ def parse_parts_spec(parts_spec, available_parts=None):
     
     return selected
 
-def download_file(url, dest_path):
+def download_file(url, dest_path, show_progress=True):
     """Télécharge un fichier avec barre de progression"""
-    response = requests.get(url, stream=True, timeout=60)
+    response = _SESSION.get(url, stream=True, timeout=60)
     response.raise_for_status()
     
     total_size = int(response.headers.get('content-length', 0))
     
-    with open(dest_path, 'wb') as f:
-        if total_size == 0:
-            f.write(response.content)
+    # Écriture dans un .partial renommé à la fin: un téléchargement interrompu n'est jamais pris pour un .gz complet
+    partial_path = Path(f"{dest_path}.partial")
+    with open(partial_path, 'wb') as f:
+        if total_size == 0 or not show_progress:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
         else:
             downloaded = 0
-            chunk_size = 8192
+            chunk_size = 1 << 20
+            last_print = 0.0
             for chunk in response.iter_content(chunk_size=chunk_size):
                 if chunk:
                     f.write(chunk)
                     downloaded += len(chunk)
-                    percent = (downloaded / total_size) * 100
-                    print(f"\r  Téléchargement: {percent:.1f}% ({downloaded}/{total_size} bytes)", end='')
+                    # Progression affichée au plus 2 fois par seconde (et à la fin)
+                    now = time.monotonic()
+                    if now - last_print >= 0.5 or downloaded == total_size:
+                        last_print = now
+                        percent = (downloaded / total_size) * 100
+                        sys.stdout.write(f"\r  Téléchargement: {percent:.1f}% ({downloaded}/{total_size} bytes)")
+                        sys.stdout.flush()
             print()  # Newline après progression
+    partial_path.replace(dest_path)
+
+def open_gzip(gz_path, threads=None):
+    """
+    Ouvre un .gz en lecture binaire avec le décompresseur le plus rapide disponible
+    threads: threads de décompression rapidgzip (défaut: tous les cœurs)
+    """
+    if rapidgzip is not None:
+        return rapidgzip.open(str(gz_path), parallelization=threads or os.cpu_count() or 1)
+    if igzip is not None:
+        return igzip.open(gz_path, 'rb')
+    return gzip.open(gz_path, 'rb')
 
-def download_and_decompress(class_name, parts, work_dir):
-    """Télécharge et décompresse les parts"""
+def download_and_decompress(class_name, parts, work_dir, decompress=True):
+    """
+    Télécharge et décompresse les parts
+    decompress=False: garde les .gz tels quels, filter_by_pattern les lit en flux (pas de .nq intermédiaire)
+    """
     work_dir = Path(work_dir)
     work_dir.mkdir(exist_ok=True)
     
@@ -210,6 +303,35 @@ def download_and_decompress(class_name, parts, work_dir):
     
     print_color(f"\n📦 Téléchargement/Décompression de {len(parts)} parts...", Colors.BLUE)
     
+    # Téléchargements manquants en parallèle (I/O-bound), tous via la session partagée
+    to_download = [
+        part_file for part_file in parts
+        if not (work_dir / part_file.replace('.gz', '')).exists() and not (work_dir / part_file).exists()
+    ]
+    download_errors = set()
+    if to_download:
+        workers = min(DOWNLOAD_WORKERS, len(to_download))
+        print(f"\n  ⬇️  {len(to_download)} parts à télécharger ({workers} en parallèle)")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    download_file,
+                    urljoin(WDC_BASE_URL, f"{class_name}/{part_file}"),
+                    work_dir / part_file,
+                    show_progress=(workers == 1),
+                ): part_file
+                for part_file in to_download
+            }
+            for future in as_completed(futures):
+                part_file = futures[future]
+                try:
+                    future.result()
+                    size = (work_dir / part_file).stat().st_size / (1024**2)
+                    print_color(f"  ✅ {part_file} téléchargé ({size:.1f} MB)", Colors.GREEN)
+                except Exception as e:
+                    print_color(f"  ❌ {part_file} Erreur: {e}", Colors.RED)
+                    download_errors.add(part_file)
+    
     for i, part_file in enumerate(parts, 1):
         print(f"\n[{i}/{len(parts)}] {part_file}")
         
@@ -223,27 +345,23 @@ def download_and_decompress(class_name, parts, work_dir):
             decompressed_files.append(nq_path)
             continue
         
-        # Download si nécessaire
-        if not gz_path.exists():
-            url = urljoin(WDC_BASE_URL, f"{class_name}/{part_file}")
-            print(f"  ⬇️  Téléchargement depuis {url}")
-            try:
-                download_file(url, gz_path)
-                size = gz_path.stat().st_size / (1024**2)
-                print_color(f"  ✅ Téléchargé ({size:.1f} MB)", Colors.GREEN)
-            except Exception as e:
-                print_color(f"  ❌ Erreur: {e}", Colors.RED)
-                continue
-        else:
-            size = gz_path.stat().st_size / (1024**2)
-            print_color(f"  ✅ Déjà téléchargé ({size:.1f} MB)", Colors.GREEN)
+        if part_file in download_errors:
+            print_color("  ❌ Téléchargement échoué, part ignorée", Colors.RED)
+            continue
+        
+        size = gz_path.stat().st_size / (1024**2)
+        print_color(f"  ✅ Téléchargé ({size:.1f} MB)", Colors.GREEN)
+        
+        if not decompress:
+            decompressed_files.append(gz_path)
+            continue
         
         # Décompresser
         print("  📂 Décompression...")
         try:
-            with gzip.open(gz_path, 'rb') as f_in:
+            with open_gzip(gz_path) as f_in:
                 with open(nq_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+                    shutil.copyfileobj(f_in, f_out, 1 << 20)
             
             size = nq_path.stat().st_size / (1024**2)
             print_color(f"  ✅ Décompressé ({size:.1f} MB)", Colors.GREEN)
@@ -254,61 +372,203 @@ def download_and_decompress(class_name, parts, work_dir):
     
     return decompressed_files
 
-def filter_by_pattern(files, pattern, output_file, collect_top_props=False, top_n=100):
+_PRED_RE = re.compile(rb'<([^>]+)>')
+
+def extract_predicate(line):
+    """Premier <...> non vide de la ligne (le prédicat en NQuads), ou None"""
+    lt = line.find(b'<')
+    if lt < 0:
+        return None
+    gt = line.find(b'>', lt + 1)
+    if gt < 0:
+        return None
+    if gt > lt + 1:
+        return line[lt + 1:gt]
+    # "<>" vide: la regex saute au prochain <...>
+    m = _PRED_RE.search(line, gt + 1)
+    return m.group(1) if m else None
+
+def split_byte_ranges(file_path, n):
+    """Découpe un fichier en n plages d'octets; _filter_one les réaligne sur les fins de ligne"""
+    size = os.path.getsize(file_path)
+    step = max(1, -(-size // n))
+    return [(start, min(start + step, size)) for start in range(0, size, step)] or [(0, 0)]
+
+def iter_range_lines(in_f, start, end):
+    """Lignes qui COMMENCENT dans [start, end)"""
+    pos = start
+    if start > 0:
+        # La ligne à cheval sur start appartient à la plage précédente
+        in_f.seek(start - 1)
+        pos = start - 1 + len(in_f.readline())
+    while pos < end:
+        line = in_f.readline()
+        if not line:
+            break
+        pos += len(line)
+        yield line
+
+def _filter_one(file_path, patterns_bytes, shard_paths, start, end, collect_top_props, gz_threads=None):
     """
-    Filtre les lignes dont le PRÉDICAT contient le pattern
-    Équivalent à: ?x <...pattern...> ?value
+    Filtre les lignes de file_path qui commencent dans [start, end): une ligne est écrite
+    dans shard_paths[i] pour chaque patterns_bytes[i] contenu dans son prédicat normalisé.
+    end=None: tout le fichier (cas des .gz lus en flux, non découpables).
+    gz_threads: threads de décompression de ce worker pour un .gz
+    Returns: (lignes lues, [lignes matchées par pattern], {prédicat: count})
+    """
+    lines = 0
+    matched = [0] * len(patterns_bytes)
+    predicates_found = defaultdict(int)
+    
+    is_gz = str(file_path).endswith('.gz')
+    out_files = [open(shard_path, 'wb', buffering=WRITE_BUFFER) for shard_path in shard_paths]
+    # Fonctions liées en variables locales pour la boucle par ligne
+    extract = extract_predicate
+    normalize = normalize_bytes_for_matching
+    targets = list(enumerate(zip(patterns_bytes, [out_f.write for out_f in out_files])))
+    try:
+        with (open_gzip(file_path, gz_threads) if is_gz else open(file_path, 'rb')) as in_f:
+            for line in (in_f if end is None else iter_range_lines(in_f, start, end)):
+                lines += 1
+                
+                predicate = extract(line)
+                if predicate is not None:
+                    if collect_top_props:
+                        predicates_found[predicate.decode('utf-8', errors='ignore')] += 1
+                    
+                    # Le prédicat n'est normalisé qu'une fois, quel que soit le nombre de patterns
+                    predicate_normalized = normalize(predicate)
+                    for i, (pattern_bytes, write) in targets:
+                        if pattern_bytes in predicate_normalized:
+                            write(line)
+                            matched[i] += 1
+    finally:
+        for out_f in out_files:
+            out_f.close()
+    
+    return lines, matched, predicates_found
+
+def filtered_meta_path(filtered_file):
+    return Path(filtered_file).with_suffix('.meta.json')
+
+def count_filtered_lines(filtered_file):
+    """
+    Nombre de lignes d'un fichier filtré: lu depuis son .meta.json s'il décrit bien ce fichier
+    (même taille), sinon compté par blocs d'octets
     """
-    print_color(f"\n🔍 Filtrage par pattern dans les PRÉDICATS: '{pattern}'", Colors.BLUE)
+    meta_file = filtered_meta_path(filtered_file)
+    if meta_file.exists():
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('size') == os.path.getsize(filtered_file):
+            return meta['matched']
+    count = 0
+    last = b'\n'
+    with open(filtered_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 24), b''):
+            count += block.count(b'\n')
+            last = block[-1:]
+    # Dernière ligne sans retour à la ligne
+    return count + (last != b'\n')
+
+def filter_by_patterns(files, patterns, output_map, collect_top_props=False, top_n=100, workers=None):
+    """
+    Filtre en UNE seule passe sur les fichiers les lignes dont le PRÉDICAT contient chacun des patterns
+    Équivalent à: ?x <...pattern...> ?value, pour chaque pattern
+    output_map: {pattern: fichier de sortie}
+    Les fichiers (ou plages d'un même fichier) sont traités en parallèle par des processus.
+    Returns: {pattern: lignes matchées}
+    """
+    print_color(f"\n🔍 Filtrage par pattern dans les PRÉDICATS: {', '.join(repr(p) for p in patterns)}", Colors.BLUE)
     print("   Recherche: <predicate> qui contient le pattern (case-insensitive)")
     
-    pattern_normalized = normalize_for_matching(pattern)
-    print(f"   Pattern normalisé: '{pattern_normalized}'")
+    patterns_bytes = []
+    for pattern in patterns:
+        pattern_normalized = normalize_for_matching(pattern)
+        print(f"   Pattern normalisé: '{pattern_normalized}'")
+        patterns_bytes.append(pattern_normalized.encode('ascii'))
+    
+    workers = workers or os.cpu_count() or 1
+    # Assez de plages pour occuper tous les workers, même avec un seul full_graph.nq
+    ranges_per_file = max(1, -(-workers // max(1, len(files))))
+    print(f"   Workers: {workers} | Plages par fichier: {ranges_per_file}")
+    # Les .gz sont décompressés dans les workers: les cœurs sont partagés entre les .gz traités
+    # en même temps au lieu de lancer cpu_count threads rapidgzip dans chaque processus
+    gz_count = sum(1 for file_path in files if str(file_path).endswith('.gz'))
+    gz_threads = max(1, (os.cpu_count() or 1) // min(workers, gz_count)) if gz_count else 1
     
     total_lines = 0
-    matched_lines = 0
-    predicates_found = defaultdict(int) if collect_top_props else None
+    matched_lines = {pattern: 0 for pattern in patterns}
+    predicates_found = Counter() if collect_top_props else None
     
-    with open(output_file, 'w', encoding='utf-8') as out_f:
+    output_paths = [Path(output_map[pattern]) for pattern in patterns]
+    with tempfile.TemporaryDirectory(dir=output_paths[0].parent) as shard_dir, \
+         ProcessPoolExecutor(max_workers=workers) as executor:
+        tasks = []
         for file_path in files:
-            print(f"\n  📄 Traitement: {file_path.name}")
-            file_lines = 0
-            file_matched = 0
-            
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as in_f:
-                for line in in_f:
-                    file_lines += 1
-                    total_lines += 1
-                    
-                    # Le prédicat est TOUJOURS le premier <...> dans NQuads
-                    # Format: (sujet_ou_blanknode) <predicate> (objet) <graph> .
-                    predicates = re.findall(r'<([^>]+)>', line)
-                    
-                    if len(predicates) >= 1:
-                        predicate = predicates[0]  # Premier <...> = prédicat
-                        if collect_top_props:
-                            predicates_found[predicate] += 1
-                        predicate_normalized = normalize_for_matching(predicate)
-                        
-                        # Match si pattern dans prédicat normalisé
-                        if pattern_normalized in predicate_normalized:
-                            out_f.write(line)
-                            matched_lines += 1
-                            file_matched += 1
-                            predicates_found[predicate] += 1
-                    
-                    if file_lines % 100000 == 0:
-                        print(f"\r    Lignes: {file_lines:,} | Matches: {file_matched:,}", end='')
-            
-            print(f"\r    Lignes: {file_lines:,} | Matches: {file_matched:,}")
-            percent = (file_matched / file_lines * 100) if file_lines > 0 else 0
-            print(f"    Taux: {percent:.2f}%")
+            futures = []
+            ranges = [(0, None)] if str(file_path).endswith('.gz') else split_byte_ranges(file_path, ranges_per_file)
+            for start, end in ranges:
+                shard_paths = [Path(shard_dir) / f"shard_{len(tasks)}_{len(futures)}_{i}" for i in range(len(patterns))]
+                future = executor.submit(
+                    _filter_one, file_path, patterns_bytes, shard_paths, start, end, collect_top_props, gz_threads,
+                )
+                futures.append((future, shard_paths))
+            tasks.append((file_path, futures))
+        
+        # Concaténation des shards dans l'ordre d'origine des fichiers
+        out_files = [open(output_path, 'wb', buffering=WRITE_BUFFER) for output_path in output_paths]
+        try:
+            for file_path, futures in tasks:
+                print(f"\n  📄 Traitement: {file_path.name}")
+                file_lines = 0
+                file_matched = [0] * len(patterns)
+                is_gz = str(file_path).endswith('.gz')
+                for future, shard_paths in futures:
+                    try:
+                        lines, matched, shard_predicates = future.result()
+                    except Exception as e:
+                        if not is_gz:
+                            raise
+                        # .gz corrompu ou tronqué: la part est ignorée, comme avant le filtrage en flux
+                        print_color(f"  ❌ Erreur décompression: {e}", Colors.RED)
+                        for shard_path in shard_paths:
+                            if shard_path.exists():
+                                os.remove(shard_path)
+                        continue
+                    file_lines += lines
+                    if collect_top_props:
+                        predicates_found.update(shard_predicates)
+                    for i, shard_path in enumerate(shard_paths):
+                        file_matched[i] += matched[i]
+                        with open(shard_path, 'rb') as shard_f:
+                            shutil.copyfileobj(shard_f, out_files[i], WRITE_BUFFER)
+                        os.remove(shard_path)
+                total_lines += file_lines
+                
+                for pattern, count in zip(patterns, file_matched):
+                    matched_lines[pattern] += count
+                    percent = (count / file_lines * 100) if file_lines > 0 else 0
+                    print(f"    Lignes: {file_lines:,} | Matches '{pattern}': {count:,} | Taux: {percent:.2f}%")
+        finally:
+            for out_f in out_files:
+                out_f.close()
+    
+    # Comptes conservés à côté de chaque fichier filtré pour ne pas le relire aux runs suivants
+    for pattern, output_path in zip(patterns, output_paths):
+        with open(filtered_meta_path(output_path), 'w', encoding='utf-8') as meta_f:
+            json.dump({
+                'matched': matched_lines[pattern],
+                'total': total_lines,
+                'size': os.path.getsize(output_path),
+            }, meta_f)
     
     print_color(f"\n✅ Filtrage terminé", Colors.GREEN)
     print(f"   Total lignes traitées: {total_lines:,}")
-    print(f"   Lignes matchées: {matched_lines:,}")
-    if total_lines > 0:
-        print(f"   Taux global: {(matched_lines/total_lines*100):.2f}%")
+    for pattern in patterns:
+        print(f"   Lignes matchées '{pattern}': {matched_lines[pattern]:,}")
+        if total_lines > 0:
+            print(f"   Taux global: {(matched_lines[pattern]/total_lines*100):.2f}%")
     
     # Afficher les prédicats trouvés (top N)
     if collect_top_props and predicates_found is not None:
@@ -318,6 +578,56 @@ def filter_by_pattern(files, pattern, output_file, collect_top_props=False, top_
     
     return matched_lines
 
+def filter_by_pattern(files, pattern, output_file, collect_top_props=False, top_n=100, workers=None):
+    """
+    Filtre les lignes dont le PRÉDICAT contient le pattern
+    Équivalent à: ?x <...pattern...> ?value
+    """
+    matched_lines = filter_by_patterns(
+        files, [pattern], {pattern: output_file},
+        collect_top_props=collect_top_props, top_n=top_n, workers=workers,
+    )
+    return matched_lines[pattern]
+
+
+class ValueMap(Mapping):
+    """
+    {value_normalized: [(original_value, iri), ...]} stocké en colonnes (SoA):
+    deux listes parallèles origs/iris + offsets par clé, au lieu d'un tuple Python par entrée.
+    Les clés gardent l'ordre d'insertion du dict source.
+    """
+
+    def __init__(self, groups):
+        self.origs = []
+        self.iris = []
+        self.offsets = array('q', [0])
+        self.key_index = {}
+        for key, entries in groups.items():
+            self.key_index[key] = len(self.key_index)
+            for orig, iri in entries:
+                self.origs.append(orig)
+                self.iris.append(iri)
+            self.offsets.append(len(self.origs))
+
+    def __getitem__(self, key):
+        i = self.key_index[key]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.origs[start:end], self.iris[start:end]))
+
+    def __contains__(self, key):
+        return key in self.key_index
+
+    def __iter__(self):
+        return iter(self.key_index)
+
+    def __len__(self):
+        return len(self.key_index)
+
+    def entry_count(self):
+        return len(self.origs)
+
+# <subj> <pred> "value" en début de ligne; [^\S\n] et \n exclus pour ne jamais déborder sur la ligne suivante
+_NQUAD_VALUE_RE = re.compile(rb'(?m)^(\S+)[^\S\n]+<([^>\n]+)>[^\S\n]+"([^"\n]+)"')
 
 def extract_unique_iris(filtered_file):
     """
@@ -328,26 +638,31 @@ def extract_unique_iris(filtered_file):
     
     # {value_normalized: [(original_value, wdc_iri), ...]}
     value_map = defaultdict(list)
-    all_raw_values = set()
-    all_iris = set()
+    # Pools d'internement: une seule instance str par IRI / valeur distincte (sert aussi de set)
+    all_raw_values = {}
+    all_iris = {}
     country_code_changes = defaultdict(int)
     
     line_count = 0
-    with open(filtered_file, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            line_count += 1
+    next_tick = time.monotonic() + PROGRESS_INTERVAL
+    with open(filtered_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # Fichier mappé en mémoire: une seule passe finditer au lieu d'un re.match par ligne
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            # Comptage des lignes par blocs (mmap n'a pas de count())
+            line_count = sum(mm[i:i + (1 << 24)].count(b"\n") for i in range(0, size, 1 << 24))
+            if size and mm[-1:] != b"\n":
+                line_count += 1
             
             # Parse NQuads: <subj> <pred> "value" <graph>
             # ou: _:blanknode <pred> "value" <graph>
-            match = re.match(r'(\S+)\s+<([^>]+)>\s+"([^"]+)"', line)
-            
-            if match:
-                subject = match.group(1)
-                predicate = match.group(2)
-                value = match.group(3)
+            for i, match in enumerate(_NQUAD_VALUE_RE.finditer(mm), 1):
+                subject = match.group(1).decode('utf-8', errors='ignore')
+                value = match.group(3).decode('utf-8', errors='ignore')
                 
-                all_raw_values.add(value)
-                all_iris.add(subject)
+                value = all_raw_values.setdefault(value, value)
+                subject = all_iris.setdefault(subject, subject)
                 
                 # Normaliser la valeur
                 value_normalized = normalize_for_matching(value)
@@ -364,9 +679,15 @@ def extract_unique_iris(filtered_file):
                 
                 if value_normalized:
                     value_map[value_normalized].append((value, subject))
-            
-            if line_count % 10000 == 0:
-                print(f"\r  Lignes: {line_count:,} | Valeurs distinctes: {len(all_raw_values)} | IRIs: {len(all_iris)}", end='')
+                
+                # Progression échantillonnée: au plus 10 affichages par seconde
+                if not i & PROGRESS_MASK and (now := time.monotonic()) >= next_tick:
+                    sys.stdout.write(f"\r  Triplets: {i:,} | Valeurs distinctes: {len(all_raw_values)} | IRIs: {len(all_iris)}")
+                    sys.stdout.flush()
+                    next_tick = now + PROGRESS_INTERVAL
+        finally:
+            if size:
+                mm.close()
     
     print(f"\r  Lignes: {line_count:,} | Valeurs distinctes: {len(all_raw_values)} | IRIs: {len(all_iris)}")
     
@@ -383,6 +704,8 @@ def extract_unique_iris(filtered_file):
     print(f"   Valeurs brutes distinctes (?value):  {len(all_raw_values):,}")
     print(f"   Valeurs normalisées:                 {len(value_map):,}")
     
+    value_map = ValueMap(value_map)
+    
     # Distribution des longueurs
     lengths = defaultdict(int)
     for norm_val in value_map:
@@ -394,7 +717,7 @@ def extract_unique_iris(filtered_file):
     
     # Exemples
     print(f"\n📋 Exemples de valeurs (5 premiers):")
-    for i, (norm, entries) in enumerate(list(value_map.items())[:5]):
+    for i, (norm, entries) in enumerate(islice(value_map.items(), 5)):
         orig, iri = entries[0]
         # Tronquer les valeurs trop longues
         orig_display = orig if len(orig) <= 50 else orig[:47] + "..."
@@ -403,6 +726,26 @@ def extract_unique_iris(filtered_file):
     
     return value_map
 
+def iter_sparql_bindings(query, timeout=300):
+    """
+    Exécute une requête SELECT sur Wikidata et itère sur les bindings.
+    Avec ijson le JSON est parsé en flux (mémoire constante), sinon il est chargé en entier.
+    """
+    response = _SESSION.get(
+        WIKIDATA_ENDPOINT,
+        params={"query": query},
+        headers={"Accept": "application/sparql-results+json", "User-Agent": USER_AGENT},
+        stream=True,
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    with response:
+        if ijson is None:
+            yield from response.json()["results"]["bindings"]
+            return
+        response.raw.decode_content = True  # réponse gzip décompressée à la volée
+        yield from ijson.items(response.raw, "results.bindings.item")
+
 def fetch_wikidata_values(wikidata_property, wkd_class=None):
     """Récupère les valeurs depuis Wikidata pour une propriété donnée, avec filtre de classe optionnel"""
     print_color(f"\n🌐 Récupération des valeurs Wikidata ({wikidata_property})...", Colors.BLUE)
@@ -412,10 +755,6 @@ def fetch_wikidata_values(wikidata_property, wkd_class=None):
         print_color(f"❌ Format invalide: {wikidata_property}", Colors.RED)
         return {}
     
-    sparql = SPARQLWrapper(WIKIDATA_ENDPOINT)
-    sparql.setReturnFormat(JSON)
-    sparql.setTimeout(300)
-    
     class_filter = ""
     wkd_class_norm = normalize_wkd_class(wkd_class)
     if wkd_class_norm:
@@ -449,20 +788,19 @@ def fetch_wikidata_values(wikidata_property, wkd_class=None):
     
     print(f"   Requête SPARQL pour {prop}...")
     
-    sparql.setQuery(query)
-    
     try:
-        results = sparql.query().convert()
-        
         # {value_normalized: [(original_value, wikidata_uri), ...]}
         value_map = defaultdict(list)
-        all_raw_values = set()
+        # Pools d'internement: une seule instance str par valeur / entité distincte
+        all_raw_values = {}
+        entity_pool = {}
         
-        for result in results["results"]["bindings"]:
+        for result in iter_sparql_bindings(query):
             value = result["value"]["value"]
             entity_uri = result["entity"]["value"]
             
-            all_raw_values.add(value)
+            value = all_raw_values.setdefault(value, value)
+            entity_uri = entity_pool.setdefault(entity_uri, entity_uri)
             
             value_normalized = normalize_for_matching(value)
             
@@ -472,15 +810,17 @@ def fetch_wikidata_values(wikidata_property, wkd_class=None):
             if value_normalized:
                 value_map[value_normalized].append((value, entity_uri))
         
+        value_map = ValueMap(value_map)
+        
         print_color(f"✅ {len(all_raw_values)} valeurs brutes distinctes", Colors.GREEN)
         print_color(f"✅ {len(value_map)} valeurs normalisées distinctes", Colors.GREEN)
         
-        total_entities = sum(len(entries) for entries in value_map.values())
+        total_entities = value_map.entry_count()
         print_color(f"✅ {total_entities} entités Wikidata", Colors.GREEN)
         
         # Exemples
         print(f"\n📋 Exemples Wikidata (5 premiers):")
-        for i, (norm, entries) in enumerate(list(value_map.items())[:5]):
+        for i, (norm, entries) in enumerate(islice(value_map.items(), 5)):
             orig, uri = entries[0]
             print(f"   {i+1}. '{orig}' → '{norm}' (len={len(norm)})")
         
@@ -490,6 +830,54 @@ def fetch_wikidata_values(wikidata_property, wkd_class=None):
         print_color(f"❌ Erreur: {e}", Colors.RED)
         return {}
 
+FUZZY_PARALLEL_MIN_KEYS = 200000  # en dessous, le coût de démarrage des processus domine
+FUZZY_CHUNK_SIZE = 20000
+
+def prefix_candidates(wdc_norm, wiki_sorted, wiki_order, min_length):
+    """Clés Wikidata dont wdc_norm est préfixe ou qui sont préfixe de wdc_norm, dans l'ordre de wiki_order"""
+    # wiki_norm plus court: préfixe strict de wdc_norm
+    wiki_candidates = [wdc_norm[:k] for k in range(min_length, len(wdc_norm)) if wdc_norm[:k] in wiki_order]
+    # wiki_norm plus long ou égal: commence par wdc_norm
+    i = bisect_left(wiki_sorted, wdc_norm)
+    while i < len(wiki_sorted) and wiki_sorted[i].startswith(wdc_norm):
+        wiki_candidates.append(wiki_sorted[i])
+        i += 1
+    wiki_candidates.sort(key=wiki_order.__getitem__)
+    return wiki_candidates
+
+_fuzzy_index = None
+
+def _init_fuzzy_worker(wiki_sorted, wiki_order, min_length):
+    # Index Wikidata chargé une seule fois par processus (hérité sans copie avec fork)
+    global _fuzzy_index
+    _fuzzy_index = (wiki_sorted, wiki_order, min_length)
+
+def _prefix_candidates_chunk(wdc_keys):
+    return [prefix_candidates(wdc_norm, *_fuzzy_index) for wdc_norm in wdc_keys]
+
+def iter_prefix_candidates(wdc_keys, wiki_sorted, wiki_order, min_length, workers=None):
+    """Listes de candidats pour chaque clé de wdc_keys, dans l'ordre"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(wdc_keys) < FUZZY_PARALLEL_MIN_KEYS:
+        for wdc_norm in wdc_keys:
+            yield prefix_candidates(wdc_norm, wiki_sorted, wiki_order, min_length)
+        return
+    
+    chunks = [wdc_keys[i:i + FUZZY_CHUNK_SIZE] for i in range(0, len(wdc_keys), FUZZY_CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_fuzzy_worker,
+                             initargs=(wiki_sorted, wiki_order, min_length)) as executor:
+        for chunk_candidates in executor.map(_prefix_candidates_chunk, chunks):
+            yield from chunk_candidates
+
+class Match(NamedTuple):
+    """Paire WDC ↔ Wikidata trouvée par fuzzy_link (min_len vide pour les matches exacts)"""
+    wdc_iri: str
+    wikidata_uri: str
+    wdc_value: str
+    wiki_value: str
+    method: str
+    min_len: object = ''
+
 def fuzzy_link(wdc_map, wikidata_map, compare_with_shortest=False):
     """
     Lie les entités WDC et Wikidata via fuzzy matching
@@ -512,6 +900,14 @@ def fuzzy_link(wdc_map, wikidata_map, compare_with_shortest=False):
     short_value_infos = []
     wdc_values_matched = set()  # Pour compter les valeurs WDC distinctes matchées
     
+    # Méthodes liées une fois en variables locales: évite la recherche d'attribut à chaque paire
+    wdc_get = wdc_map.__getitem__
+    wiki_get = wikidata_map.__getitem__
+    add_pair = matched_pairs.add
+    add_exact = exact_matches.append
+    add_fuzzy = fuzzy_matches.append
+    add_val = wdc_values_matched.add
+    
     print("\n   Phase 1: Matching exact...")
     for wdc_norm in wdc_map:
         # Filtrer les valeurs trop courtes
@@ -519,19 +915,14 @@ def fuzzy_link(wdc_map, wikidata_map, compare_with_shortest=False):
             continue
             
         if wdc_norm in wikidata_map:
-            for wdc_orig, wdc_iri in wdc_map[wdc_norm]:
-                for wiki_orig, wiki_uri in wikidata_map[wdc_norm]:
+            wiki_entries = wiki_get(wdc_norm)
+            for wdc_orig, wdc_iri in wdc_get(wdc_norm):
+                for wiki_orig, wiki_uri in wiki_entries:
                     pair = (wdc_iri, wiki_uri)
                     if pair not in matched_pairs:
-                        matched_pairs.add(pair)
-                        exact_matches.append({
-                            'wdc_iri': wdc_iri,
-                            'wikidata_uri': wiki_uri,
-                            'wdc_value': wdc_orig,
-                            'wiki_value': wiki_orig,
-                            'method': 'exact'
-                        })
-                        wdc_values_matched.add(wdc_orig)
+                        add_pair(pair)
+                        add_exact(Match(wdc_iri, wiki_uri, wdc_orig, wiki_orig, 'exact'))
+                        add_val(wdc_orig)
     
     print(f"   ✅ {len(exact_matches)} paires (exact)")
     
@@ -544,6 +935,20 @@ def fuzzy_link(wdc_map, wikidata_map, compare_with_shortest=False):
 
     print("\n   Phase 2: Matching fuzzy (longueur minimale)...")
     
+    # Deux valeurs matchent si l'une est préfixe de l'autre: au lieu de comparer toutes les paires,
+    # on cherche les préfixes de wdc_norm par lookup direct et ses extensions par bisect dans une liste triée.
+    wiki_sorted = sorted(wiki_norm for wiki_norm in wikidata_map if len(wiki_norm) >= MIN_LENGTH)
+    # Ordre d'itération de wikidata_map, pour garder l'ordre des matches de la double boucle
+    wiki_order = {wiki_norm: i for i, wiki_norm in enumerate(wikidata_map)}
+    
+    # Recherche des candidats (CPU) répartie sur plusieurs processus pour les grosses maps;
+    # l'ajout des paires reste séquentiel pour garder le même dédoublonnage que la version série.
+    long_keys = [wdc_norm for wdc_norm in wdc_map if len(wdc_norm) >= MIN_LENGTH]
+    candidates_iter = iter_prefix_candidates(long_keys, wiki_sorted, wiki_order, MIN_LENGTH)
+    
+    progress_shown = False
+    next_tick = time.monotonic() + PROGRESS_INTERVAL
+    
     for wdc_norm in wdc_map:
         # Filtrer les valeurs trop courtes
         if len(wdc_norm) < MIN_LENGTH:
@@ -551,38 +956,32 @@ def fuzzy_link(wdc_map, wikidata_map, compare_with_shortest=False):
             candidates = wikidata_map.get(wdc_norm, [])
             short_value_infos.append((wdc_norm, wdc_map[wdc_norm], candidates))
             continue
-            
-        for wiki_norm in wikidata_map:
-            # Filtrer les valeurs trop courtes
-            if len(wiki_norm) < MIN_LENGTH:
-                continue
-                
+        
+        wiki_candidates = next(candidates_iter)
+        
+        for wiki_norm in wiki_candidates:
             total_comparisons += 1
             
             # Longueur minimale pour cette paire
             min_len = min(len(wdc_norm), len(wiki_norm))
             
-            # Comparer sur les min_len premiers caractères
-            if wdc_norm[:min_len] == wiki_norm[:min_len]:
-                for wdc_orig, wdc_iri in wdc_map[wdc_norm]:
-                    for wiki_orig, wiki_uri in wikidata_map[wiki_norm]:
-                        pair = (wdc_iri, wiki_uri)
-                        if pair not in matched_pairs:
-                            matched_pairs.add(pair)
-                            fuzzy_matches.append({
-                                'wdc_iri': wdc_iri,
-                                'wikidata_uri': wiki_uri,
-                                'wdc_value': wdc_orig,
-                                'wiki_value': wiki_orig,
-                                'min_len': min_len,
-                                'method': f'fuzzy_{min_len}'
-                            })
-                            wdc_values_matched.add(wdc_orig)
+            method = f'fuzzy_{min_len}'
+            wiki_entries = wiki_get(wiki_norm)
+            for wdc_orig, wdc_iri in wdc_get(wdc_norm):
+                for wiki_orig, wiki_uri in wiki_entries:
+                    pair = (wdc_iri, wiki_uri)
+                    if pair not in matched_pairs:
+                        add_pair(pair)
+                        add_fuzzy(Match(wdc_iri, wiki_uri, wdc_orig, wiki_orig, method, min_len))
+                        add_val(wdc_orig)
             
-            if total_comparisons % 100000 == 0:
-                print(f"\r   Comparaisons: {total_comparisons:,} | Matches: {len(fuzzy_matches)}", end='')
+            if not total_comparisons & PROGRESS_MASK and (now := time.monotonic()) >= next_tick:
+                sys.stdout.write(f"\r   Candidats: {total_comparisons:,} | Matches: {len(fuzzy_matches)}")
+                sys.stdout.flush()
+                next_tick = now + PROGRESS_INTERVAL
+                progress_shown = True
     
-    if total_comparisons >= 100000:
+    if progress_shown:
         print()  # Newline
     
     if skipped_too_short > 0:
@@ -596,8 +995,8 @@ def fuzzy_link(wdc_map, wikidata_map, compare_with_shortest=False):
                 print(f"     - '{wdc_vals}' -> aucun candidat Wikidata")
     
     # Filtrer les matches fuzzy qui sont déjà dans exact
-    exact_pairs_only = {(m['wdc_iri'], m['wikidata_uri']) for m in exact_matches}
-    fuzzy_only = [m for m in fuzzy_matches if (m['wdc_iri'], m['wikidata_uri']) not in exact_pairs_only]
+    exact_pairs_only = {(m.wdc_iri, m.wikidata_uri) for m in exact_matches}
+    fuzzy_only = [m for m in fuzzy_matches if (m.wdc_iri, m.wikidata_uri) not in exact_pairs_only]
     
     print(f"   ✅ {len(fuzzy_matches)} paires (fuzzy total)")
     print(f"   ✅ {len(fuzzy_only)} paires (fuzzy nouvelles)")
@@ -606,20 +1005,28 @@ def fuzzy_link(wdc_map, wikidata_map, compare_with_shortest=False):
     
     return all_matches, wdc_values_matched
 
+_SAMEAS_MID = "> <http://www.w3.org/2002/07/owl#sameAs> <"
+
+def write_batched(f, lines, batch_size=WRITE_BATCH_ROWS):
+    """
+    Écrit des lignes str dans un fichier ouvert en binaire, par blocs de batch_size:
+    un seul join + encode UTF-8 + write() par bloc au lieu d'un par ligne
+    """
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            break
+        f.write("".join(batch).encode("utf-8"))
+
 def export_unmatched_values(wdc_values_matched, wdc_map, output_dir, key_name=None):
     output_dir = Path(output_dir)
     header = f"{key_name}_value" if key_name else "wdc_value"
-    unmatched_values = sorted({
-        orig
-        for entries in wdc_map.values()
-        for orig, _iri in entries
-        if orig not in wdc_values_matched
-    })
+    unmatched_values = sorted({orig for orig in wdc_map.origs if orig not in wdc_values_matched})
     unmatched_file = output_dir / "wdc_unmatched_values.csv"
-    with open(unmatched_file, "w", encoding="utf-8") as f:
-        f.write(f"{header}\n")
-        for val in unmatched_values:
-            f.write(f"{val}\n")
+    with open(unmatched_file, "wb") as f:
+        f.write(f"{header}\n".encode("utf-8"))
+        write_batched(f, (f"{val}\n" for val in unmatched_values))
     print(f"   ✅ {unmatched_file}")
 
 
@@ -631,19 +1038,19 @@ def export_results(matches, wdc_values_matched, wdc_map, wikidata_map, output_di
     
     # TSV détaillé
     tsv_file = output_dir / "wdc_wikidata_links.tsv"
-    with open(tsv_file, 'w', encoding='utf-8') as f:
-        f.write("wdc_iri\twikidata_uri\twdc_value\twiki_value\tmethod\tmin_len\n")
-        for m in matches:
-            min_len = m.get('min_len', '')
-            f.write(f"{m['wdc_iri']}\t{m['wikidata_uri']}\t{m['wdc_value']}\t{m['wiki_value']}\t{m['method']}\t{min_len}\n")
+    with open(tsv_file, 'wb') as f:
+        f.write(b"wdc_iri\twikidata_uri\twdc_value\twiki_value\tmethod\tmin_len\n")
+        write_batched(f, (
+            f"{m.wdc_iri}\t{m.wikidata_uri}\t{m.wdc_value}\t{m.wiki_value}\t{m.method}\t{m.min_len}\n"
+            for m in matches
+        ))
     
     print(f"   ✅ {tsv_file}")
     
     # N-Triples owl:sameAs
     nt_file = output_dir / "owl_sameas.nt"
-    with open(nt_file, 'w', encoding='utf-8') as f:
-        for m in matches:
-            f.write(f"<{m['wdc_iri']}> <http://www.w3.org/2002/07/owl#sameAs> <{m['wikidata_uri']}> .\n")
+    with open(nt_file, 'wb') as f:
+        write_batched(f, ("<" + m.wdc_iri + _SAMEAS_MID + m.wikidata_uri + "> .\n" for m in matches))
     
     print(f"   ✅ {nt_file}")
     
@@ -656,14 +1063,14 @@ def export_results(matches, wdc_values_matched, wdc_map, wikidata_map, output_di
         
         f.write(f"WDC:\n")
         f.write(f"  Valeurs normalisées distinctes: {len(wdc_map)}\n")
-        f.write(f"  IRIs totaux: {sum(len(v) for v in wdc_map.values())}\n\n")
+        f.write(f"  IRIs totaux: {wdc_map.entry_count()}\n\n")
         
         f.write(f"Wikidata:\n")
         f.write(f"  Valeurs normalisées distinctes: {len(wikidata_map)}\n")
-        f.write(f"  Entités totales: {sum(len(v) for v in wikidata_map.values())}\n\n")
+        f.write(f"  Entités totales: {wikidata_map.entry_count()}\n\n")
         
-        exact_count = len([m for m in matches if m['method'] == 'exact'])
-        fuzzy_count = len([m for m in matches if m['method'].startswith('fuzzy')])
+        exact_count = len([m for m in matches if m.method == 'exact'])
+        fuzzy_count = len([m for m in matches if m.method.startswith('fuzzy')])
         
         f.write(f"Matches:\n")
         f.write(f"  Paires (exact): {exact_count}\n")
@@ -731,12 +1138,12 @@ def main():
     else:
         available_parts = None
         if parts_spec.lower() == "all":
-            available_parts = discover_parts(class_name)
+            available_parts = discover_parts(class_name, work_dir)
             if not available_parts:
                 print_color("❌ Aucune part disponible", Colors.RED)
                 sys.exit(1)
         else:
-            available_parts = discover_parts(class_name)
+            available_parts = discover_parts(class_name, work_dir)
             if not available_parts:
                 print_color("⚠️  Impossible de récupérer la liste distante, utilisation de la spécification locale.", Colors.YELLOW)
                 available_parts = None
@@ -747,7 +1154,8 @@ def main():
             sys.exit(1)
 
         print_color(f"\n📦 {len(parts_to_download)} parts sélectionnées", Colors.GREEN)
-        decompressed_files = download_and_decompress(class_name, parts_to_download, data_dir)
+        # Les .gz ne sont décompressés qu'en flux pendant le filtrage (pas de .nq sur disque)
+        decompressed_files = download_and_decompress(class_name, parts_to_download, data_dir, decompress=False)
     if not decompressed_files:
         print_color("❌ Aucun fichier disponible", Colors.RED)
         sys.exit(1)
@@ -755,7 +1163,7 @@ def main():
     # 4. Filtrer par pattern
     filtered_file = work_dir / f"{class_name}_filtered.nq"
     if filtered_file.exists():
-        matched_count = sum(1 for _ in open(filtered_file, "r", encoding="utf-8"))
+        matched_count = count_filtered_lines(filtered_file)
         print_color(f"  ✅ Filtré déjà existant ({matched_count} lignes)", Colors.GREEN)
     else:
         matched_count = filter_by_pattern(
@@ -797,8 +1205,8 @@ def main():
     print(f"   Valeurs distinctes:                {len(wikidata_map):,}")
     
     print(f"\n🔗 LINKING:")
-    exact_count = len([m for m in matches if m['method'] == 'exact'])
-    fuzzy_count = len([m for m in matches if m['method'].startswith('fuzzy')])
+    exact_count = len([m for m in matches if m.method == 'exact'])
+    fuzzy_count = len([m for m in matches if m.method.startswith('fuzzy')])
     print(f"   Paires matchées (exact):           {exact_count:,}")
     print(f"   Paires matchées (fuzzy):           {fuzzy_count:,}")
     print(f"   TOTAL paires:                      {len(matches):,}")
@@ -1,20 +1,41 @@
 #!/usr/bin/env python3
 import argparse
+import csv
+import gzip
+import hashlib
 import os
 import re
 import json
+import multiprocessing
+import pickle
+import shutil
 import sys
+import tempfile
 import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Iterable, List
 
+import pandas as pd
 import requests
-
-
-QUAD_RE = re.compile(
-    r'^\s*(<[^>]+>|_:[^\s]+)\s+(<[^>]+>)\s+(".*?"(?:\^\^<[^>]+>|@[a-zA-Z-]+)?|<[^>]+>|_:[^\s]+)\s+(<[^>]+>)\s+\.\s*$'
-)
-TRIPLE_RE = re.compile(
-    r'^\s*(<[^>]+>|_:[^\s]+)\s+(<[^>]+>)\s+(".*?"(?:\^\^<[^>]+>|@[a-zA-Z-]+)?|<[^>]+>|_:[^\s]+)\s+\.\s*$'
+from requests.adapters import HTTPAdapter
+
+try:
+    import re2  # google-re2: linear-time DFA engine for the block tokenizer, when installed
+except ImportError:
+    re2 = None
+try:
+    import ahocorasick  # pyahocorasick: subject prefilter for scans that only keep known subjects
+except ImportError:
+    ahocorasick = None
+
+
+# One pattern for both N-Quads and N-Triples lines: the graph term is optional. The scans
+# use NQ_BLOCK_RE below; a hand-written str.find tokenizer was tried and is slower than
+# either regex, since every step of it runs as Python bytecode.
+NQ_RE = re.compile(
+    r'^(<[^>]+>|_:[^\s]+)\s+(<[^>]+>)\s+(".*?"(?:\^\^<[^>]+>|@[a-zA-Z-]+)?|<[^>]+>|_:[^\s]+)(?:\s+<[^>]+>)?\s+\.$'
 )
 
 
@@ -22,74 +43,264 @@ def parse_nq_or_nt(line):
     line = line.strip()
     if not line or line.startswith("#"):
         return None
-    m = QUAD_RE.match(line)
-    if m:
-        s, p, o, _g = m.groups()
-        return s, p, o
-    m = TRIPLE_RE.match(line)
+    m = NQ_RE.match(line)
     if m:
-        s, p, o = m.groups()
-        return s, p, o
+        return m.groups()
     return None
 
 
+# NQ_RE for a whole block of lines: same terms, but whitespace and IRIs can't cross a newline
+NQ_BLOCK_PATTERN = (
+    r'(?m)^{ws}*(<[^>\n]+>|_:{nonws}+){ws}+(<[^>\n]+>){ws}+'
+    r'(".*?"(?:\^\^<[^>\n]+>|@[a-zA-Z-]+)?|<[^>\n]+>|_:{nonws}+)(?:{ws}+<[^>\n]+>)?{ws}+\.{ws}*$'
+)
+NQ_BLOCK_RE = re.compile(NQ_BLOCK_PATTERN.format(ws=r"[^\S\n]", nonws=r"[^\s]"))
+if re2 is not None:
+    # RE2's \s is ASCII-only: spell out the characters str.isspace() accepts so the DFA
+    # tokenizes exactly like the stdlib pattern
+    _SPACES = "\t\x0b\x0c\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000"
+    NQ_BLOCK_RE = re2.compile(NQ_BLOCK_PATTERN.format(ws=f"[{_SPACES}]", nonws=f"[^\n{_SPACES}]"))
+PARSE_BLOCK_BYTES = 1 << 22
+
+# Shared HTTP session: keep-alive connections are reused across SPARQL batches instead of a
+# new TCP/TLS handshake per request, and requests asks for (and inflates) gzip bodies. The
+# pool is sized for --wd-workers; retries stay in the per-batch loops.
+WD_POOL_SIZE = 16
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": "beam-builder/1.0", "Accept-Encoding": "gzip, deflate"})
+_SESSION.mount("https://", HTTPAdapter(pool_connections=WD_POOL_SIZE, pool_maxsize=WD_POOL_SIZE, max_retries=0))
+_SESSION.mount("http://", HTTPAdapter(pool_connections=WD_POOL_SIZE, pool_maxsize=WD_POOL_SIZE, max_retries=0))
+PREFILTER_MAX_SUBJECTS = 200000  # the automaton grows with the subject terms: beyond this, parse every line
+
+
+def decode_lines(raw, errors="strict"):
+    text = raw.decode("utf-8", errors)
+    # Same line breaks as text-mode reading: \r\n and lone \r end a line too
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def split_byte_ranges(path, n):
+    """Split a file into n byte ranges; iter_raw_blocks realigns them on line ends."""
+    size = os.path.getsize(path)
+    step = max(1, -(-size // n))
+    return [(start, min(start + step, size)) for start in range(0, size, step)] or [(0, 0)]
+
+
+def iter_raw_blocks(path, start=0, end=None, block_bytes=PARSE_BLOCK_BYTES):
+    """Yield raw blocks of whole lines, for the lines that start in [start, end)."""
+    with open(path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            # Read once front to back: ask the kernel for aggressive readahead on this range
+            os.posix_fadvise(f.fileno(), start, 0 if end is None else end - start, os.POSIX_FADV_SEQUENTIAL)
+        if start > 0:
+            # The line straddling start belongs to the previous range
+            f.seek(start - 1)
+            start += len(f.readline()) - 1
+        pos = start
+        rest = b""
+        while end is None or pos < end:
+            chunk = f.read(block_bytes if end is None else min(block_bytes, end - pos))
+            if not chunk:
+                break
+            pos += len(chunk)
+            raw = rest + chunk if rest else chunk
+            cut = raw.rfind(b"\n") + 1
+            rest = raw[cut:]
+            if cut:
+                yield raw[:cut]
+        if rest:
+            if end is not None:
+                rest += f.readline()
+            yield rest
+
+
+def subject_automaton(subjects):
+    """Aho-Corasick automaton over the subject terms, or None when the prefilter doesn't apply."""
+    if ahocorasick is None or not subjects or len(subjects) > PREFILTER_MAX_SUBJECTS:
+        return None
+    automaton = ahocorasick.Automaton()
+    for subj in subjects:
+        if subj and "\n" not in subj:
+            automaton.add_word(subj, len(subj))
+    if not len(automaton):
+        return None
+    automaton.make_automaton()
+    return automaton
+
+
+def prefiltered_triples(block, subjects):
+    """
+    Parse the lines of a block whose IRI subject is in `subjects`. The subject of a line
+    starting with "<" ends at its first ">", so it is checked before the line is tokenized;
+    other lines (blank nodes, leading whitespace) are always tokenized.
+    """
+    match = NQ_BLOCK_RE.match
+    triples = []
+    for line in block.split("\n"):
+        if line[:1] == "<":
+            if line[:line.find(">") + 1] not in subjects:
+                continue
+        elif not line:
+            continue
+        m = match(line)
+        if m:
+            triples.append(m.groups())
+    return triples
+
+
+def iter_parsed_blocks(path, start=0, end=None, block_bytes=PARSE_BLOCK_BYTES, subjects=None):
+    """
+    Yield (line count, [(s, p, o), ...]) per block of whole lines, parsed by one findall call.
+    With `subjects`, lines that don't contain one of them may be skipped: the caller still
+    has to check s.
+    """
+    automaton = subject_automaton(subjects)
+    prefilter = subjects is not None
+    match = NQ_BLOCK_RE.match
+    # Raw blocks end on a newline, so each one is decoded in one call and never
+    # splits a multi-byte UTF-8 character
+    for raw in iter_raw_blocks(path, start, end, block_bytes):
+        block = decode_lines(raw)
+        block_lines = block.count("\n") + (not block.endswith("\n"))
+        if automaton is None:
+            if not prefilter:
+                yield block_lines, NQ_BLOCK_RE.findall(block)
+                continue
+            triples = prefiltered_triples(block, subjects)
+            # Once most lines are kept, the per-line check costs more than one findall
+            prefilter = len(triples) * 2 < block_lines
+            yield block_lines, triples
+            continue
+        # Only the lines holding a subject occurrence get tokenized, from their start
+        triples = []
+        rfind = block.rfind
+        find = block.find
+        last_start = -1
+        for end_idx, length in automaton.iter(block):
+            line_start = rfind("\n", 0, end_idx - length + 1) + 1
+            if line_start == last_start:
+                continue
+            last_start = line_start
+            # Match the line alone: RE2's wrapper re-encodes the whole string it is given on
+            # every call, so matching into the block at an offset would be quadratic
+            line_end = find("\n", line_start)
+            m = match(block[line_start:] if line_end < 0 else block[line_start:line_end])
+            if m:
+                triples.append(m.groups())
+        yield block_lines, triples
+
+
 def normalize_header(value):
     return value.strip().lower().replace(" ", "")
 
 
 def read_links(path, sep, wdc_col, wd_col, wdc_value_col, wd_value_col):
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+    if not first:
+        return [], [], [], []
+    parts = [normalize_header(p) for p in first.rstrip("\n").split(sep)]
+    header = "wdc_iri" in parts and "wikidata_uri" in parts
+    header_map = {name: idx for idx, name in enumerate(parts)}
+
+    if header:
+        wdc_col = header_map.get("wdc_iri", wdc_col)
+        wd_col = header_map.get("wikidata_uri", wd_col)
+        if wdc_value_col is None:
+            wdc_value_col = header_map.get("wdc_value")
+        if wd_value_col is None:
+            wd_value_col = header_map.get("wiki_value")
+
+    # Only the needed columns are tokenized, by pandas' C parser; empty and missing
+    # fields both come back as NaN. names= pads rows shorter than the widest needed
+    # column instead of letting the first row fix the width.
+    cols = sorted({wdc_col, wd_col, *(c for c in (wdc_value_col, wd_value_col) if c is not None)})
+    try:
+        df = pd.read_csv(
+            path,
+            sep=sep if len(sep) == 1 else re.escape(sep),
+            engine="c" if len(sep) == 1 else "python",
+            header=None,
+            names=range(cols[-1] + 1),
+            index_col=False,
+            skiprows=1 if header else 0,
+            usecols=cols,
+            dtype=str,
+            quoting=csv.QUOTE_NONE,
+            keep_default_na=False,
+            na_values=[""],
+            encoding="utf-8",
+        )
+    except pd.errors.EmptyDataError:
+        return [], [], [], []
+    except ValueError:
+        # Ragged rows pandas can't reconcile with the column list (the python engine
+        # rejects rows wider than names=): fall back to splitting each line
+        return read_links_by_line(path, sep, header, wdc_col, wd_col, wdc_value_col, wd_value_col)
+    # A row without both link columns can't produce a link: skip it
+    df = df[df[wdc_col].notna() & df[wd_col].notna()]
+
+    def column(col, intern=False):
+        if col is None:
+            return []
+        values = df[col].fillna("").str.strip().tolist()
+        # An entity linked several times then shares one str object; values (literals) are not interned
+        return list(map(sys.intern, values)) if intern else values
+
+    return column(wdc_col, True), column(wd_col, True), column(wdc_value_col), column(wd_value_col)
+
+
+def read_links_by_line(path, sep, header, wdc_col, wd_col, wdc_value_col, wd_value_col):
+    """Line-by-line read_links, with the same row handling as the pandas read."""
     wdc_entities = []
     wd_entities = []
     wdc_values = []
     wd_values = []
     with open(path, "r", encoding="utf-8") as f:
-        first = f.readline()
-        if not first:
-            return wdc_entities, wd_entities, wdc_values, wd_values
-        parts = [normalize_header(p) for p in first.rstrip("\n").split(sep)]
-        header = "wdc_iri" in parts and "wikidata_uri" in parts
-        header_map = {name: idx for idx, name in enumerate(parts)}
-
         if header:
-            wdc_col = header_map.get("wdc_iri", wdc_col)
-            wd_col = header_map.get("wikidata_uri", wd_col)
-            if wdc_value_col is None:
-                wdc_value_col = header_map.get("wdc_value")
-            if wd_value_col is None:
-                wd_value_col = header_map.get("wiki_value")
-        else:
-            parts = first.rstrip("\n").split(sep)
-            if len(parts) > max(wdc_col, wd_col):
-                wdc_entities.append(parts[wdc_col].strip())
-                wd_entities.append(parts[wd_col].strip())
-                if wdc_value_col is not None and len(parts) > wdc_value_col:
-                    wdc_values.append(parts[wdc_value_col].strip())
-                if wd_value_col is not None and len(parts) > wd_value_col:
-                    wd_values.append(parts[wd_value_col].strip())
-
+            f.readline()
         for line in f:
             cols = line.rstrip("\n").split(sep)
-            if len(cols) <= max(wdc_col, wd_col):
+            if len(cols) <= max(wdc_col, wd_col) or not cols[wdc_col] or not cols[wd_col]:
                 continue
-            wdc_entities.append(cols[wdc_col].strip())
-            wd_entities.append(cols[wd_col].strip())
-            if wdc_value_col is not None and len(cols) > wdc_value_col:
-                wdc_values.append(cols[wdc_value_col].strip())
-            if wd_value_col is not None and len(cols) > wd_value_col:
-                wd_values.append(cols[wd_value_col].strip())
+            wdc_entities.append(sys.intern(cols[wdc_col].strip()))
+            wd_entities.append(sys.intern(cols[wd_col].strip()))
+            if wdc_value_col is not None:
+                wdc_values.append(cols[wdc_value_col].strip() if len(cols) > wdc_value_col else "")
+            if wd_value_col is not None:
+                wd_values.append(cols[wd_value_col].strip() if len(cols) > wd_value_col else "")
     return wdc_entities, wd_entities, wdc_values, wd_values
 
 
+# Lowercased Wikidata URIs by input URI; cleared when full to bound memory
+LOWERED_WD_URIS = {}
+LOWERED_WD_URIS_MAX = 1000000
+
+
 def normalize_wd_uri(value, lowercase):
     if lowercase and value.startswith("http://www.wikidata.org/"):
-        return value.lower()
+        lowered = LOWERED_WD_URIS.get(value)
+        if lowered is None:
+            if len(LOWERED_WD_URIS) >= LOWERED_WD_URIS_MAX:
+                LOWERED_WD_URIS.clear()
+            lowered = LOWERED_WD_URIS[value] = value.lower()
+        return lowered
     return value
 
 
+# Predicates repeat on almost every triple: each one is lowercased once
+LOWERED_PREDICATES = {}
+
+
 def transform_triple(s, p, o, lowercase):
     if lowercase:
         s = normalize_wd_uri(s, lowercase)
-        p = normalize_wd_uri(p, lowercase)
+        p_out = LOWERED_PREDICATES.get(p)
+        if p_out is None:
+            p_out = LOWERED_PREDICATES[p] = normalize_wd_uri(p, lowercase)
+        p = p_out
         if not o.startswith('"'):
             o = normalize_wd_uri(o, lowercase)
     return s, p, o
@@ -102,12 +313,15 @@ def write_links(path, wdc_entities, wd_entities, dedupe):
         for wdc, wd in zip(wdc_entities, wd_entities):
             if not wdc or not wd:
                 continue
+            line = f"{wdc}\t{wd}\n"
             if dedupe:
-                key = (wdc, wd)
+                # Exact: a hash collision must never drop a gold link. One bytes object per
+                # link is still smaller than a (wdc, wd) tuple of two str
+                key = line.encode("utf-8")
                 if key in seen:
                     continue
                 seen.add(key)
-            out.write(f"{wdc}\t{wd}\n")
+            out.write(line)
 
 
 LITERAL_RE = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:(?:\^\^<[^>]+>)|@[a-zA-Z-]+)?$')
@@ -116,30 +330,248 @@ LITERAL_RE = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:(?:\^\^<[^>]+>)|@[a-zA-Z-]+)?$'
 def literal_lex(value):
     if not value.startswith('"'):
         return None
-    escape = False
-    for i in range(1, len(value)):
-        ch = value[i]
-        if escape:
-            escape = False
-            continue
-        if ch == "\\":
-            escape = True
-            continue
-        if ch == '"':
-            return value[1:i]
-    return None
-
-
-def clean_literal(value):
+    # Jump from quote to quote with str.find; a backslash before the next quote escapes
+    # one character, so the search resumes after it
+    i = 1
+    while True:
+        end = value.find('"', i)
+        if end < 0:
+            return None
+        esc = value.find("\\", i, end)
+        if esc < 0:
+            return value[1:end]
+        i = esc + 2
+
+
+def clean_literal_lex(value):
+    """Return (cleaned literal, lexical form or None), scanning the literal only once."""
     if not value.startswith('"'):
-        return value
+        return value, None
     lex = literal_lex(value)
     if lex is None:
         match = LITERAL_RE.match(value)
         if not match:
-            return value
+            return value, None
         lex = match.group(1)
-    return f"\"{lex}\""
+    elif len(value) == len(lex) + 2:
+        # Plain literal without datatype or language: already clean
+        return value, lex
+    return f"\"{lex}\"", lex
+
+
+def clean_literal(value):
+    return clean_literal_lex(value)[0]
+
+
+def is_masked_literal(value, mask_values):
+    """Whether the lexical form of a literal is in mask_values."""
+    return literal_lex(value) in mask_values
+
+
+PARSED_CACHE_BATCH = 100000  # triples per pickled batch of the split_triples parse cache
+
+
+def iter_cached_batches(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def write_lines(out, lines, seen=None):
+    """
+    Write and clear a list of output lines with a single join + write. With a `seen` set of
+    line hashes, lines that were already written through the same set are dropped.
+    """
+    if seen is not None:
+        unique = []
+        for line in lines:
+            # Storing the hash instead of the line keeps the set at one int per triple
+            h = hash(line)
+            if h not in seen:
+                seen.add(h)
+                unique.append(line)
+        lines[:] = unique
+    if lines:
+        out.write("".join(lines))
+        lines.clear()
+
+
+def copy_lines(src, out, seen=None):
+    if seen is None:
+        shutil.copyfileobj(src, out)
+        return
+    lines = []
+    for line in src:
+        lines.append(line)
+        if len(lines) >= PARSED_CACHE_BATCH:
+            write_lines(out, lines, seen)
+    write_lines(out, lines, seen)
+
+
+class TripleSplitter:
+    """Filtering/output settings of one split_triples run, shared with its worker processes."""
+
+    def __init__(
+        self,
+        keep_subjects,
+        follow,
+        lowercase_wd=False,
+        mask_values=None,
+        exclude_props=None,
+        exclude_prop_patterns=None,
+        replace_map=None,
+        progress_every=0,
+        follow_iri_objects=False,
+    ):
+        self.keep_subjects = keep_subjects
+        self.follow = follow
+        self.lowercase_wd = lowercase_wd
+        self.mask_values = mask_values
+        self.exclude_props = exclude_props
+        self.exclude_prop_patterns = exclude_prop_patterns
+        self.replace_map = replace_map
+        self.progress_every = progress_every
+        self.follow_iri_objects = follow_iri_objects
+        # Predicates repeat a lot: the exclusion verdict is computed once per distinct predicate
+        self.excluded_preds = {}
+        # Nothing to exclude, mask, replace or lowercase: triples only need their literal cleaned
+        self.plain = not (lowercase_wd or mask_values or exclude_props or exclude_prop_patterns or replace_map)
+
+    def is_excluded(self, p):
+        excluded = self.excluded_preds.get(p)
+        if excluded is None:
+            excluded = bool(self.exclude_props and p in self.exclude_props) or bool(
+                self.exclude_prop_patterns and any(pat in p.lower() for pat in self.exclude_prop_patterns)
+            )
+            self.excluded_preds[p] = excluded
+        return excluded
+
+    def collect_triple(self, s, p, o, attr_lines, rel_lines):
+        """Append the output line of a kept subject's triple; returns "attr", "rel" or None if dropped."""
+        if self.is_excluded(p):
+            return None
+        is_literal = o[0] == '"'
+        replace_map = self.replace_map
+        if replace_map:
+            s = replace_map.get(s, s)
+            if not is_literal:
+                o = replace_map.get(o, o)
+        s_out, p_out, o_out = transform_triple(s, p, o, self.lowercase_wd)
+        if is_literal:
+            o_out, lex = clean_literal_lex(o_out)
+            if self.mask_values and lex in self.mask_values:
+                return None
+            attr_lines.append(f"{s_out}\t{p_out}\t{o_out}\n")
+            return "attr"
+        rel_lines.append(f"{s_out}\t{p_out}\t{o_out}\n")
+        return "rel"
+
+    def collect_plain_triple(self, s, p, o, attr_lines, rel_lines):
+        """collect_triple for a splitter without any transformation."""
+        if o[0] == '"':
+            attr_lines.append(f"{s}\t{p}\t{clean_literal_lex(o)[0]}\n")
+            return "attr"
+        rel_lines.append(f"{s}\t{p}\t{o}\n")
+        return "rel"
+
+    def triple_collector(self):
+        return self.collect_plain_triple if self.plain else self.collect_triple
+
+    def scan_range(self, input_path, start, end, attr_path, rel_path, cache_path):
+        """
+        Parse the lines starting in [start, end): seed triples go to attr_path/rel_path, the
+        other triples to the cache_path pickle (when following). Returns (line count,
+        {"attr": n, "rel": n}, set of the followed objects of the seed triples).
+        """
+        keep_subjects = self.keep_subjects
+        follow = self.follow
+        follow_iri_objects = self.follow_iri_objects
+        replace_map = self.replace_map
+        progress_every = self.progress_every
+        is_excluded = self.is_excluded
+        collect_triple = self.triple_collector()
+        intern = sys.intern
+        reached = set()
+        cache_out = open(cache_path, "wb") if follow else None
+        cache_batch = []
+        cache_append = cache_batch.append
+        attr_lines = []
+        rel_lines = []
+        line_count = 0
+        kept = {"attr": 0, "rel": 0}
+        with open(attr_path, "w", encoding="utf-8") as attr_out, \
+             open(rel_path, "w", encoding="utf-8") as rel_out:
+            try:
+                # Without following, only seed-subject lines matter: let the prefilter skip the rest
+                blocks = iter_parsed_blocks(input_path, start, end, subjects=None if follow else keep_subjects)
+                for block_lines, block_triples in blocks:
+                    for parsed in block_triples:
+                        s, p, o = parsed
+                        # A plain set miss is one hash (cached on s for the lookups below) and an
+                        # empty-slot probe; a Python-level Bloom filter in front would only add work
+                        seed = s in keep_subjects
+                        if seed:
+                            kind = collect_triple(s, p, o, attr_lines, rel_lines)
+                            if kind:
+                                kept[kind] += 1
+                            # Only the seeds' edges are kept in memory: deeper levels are
+                            # expanded from the cache, one scan per depth
+                            if follow and o[0] != '"':
+                                if replace_map:
+                                    o = replace_map.get(o, o)
+                                if (o.startswith("_:") or (follow_iri_objects and o[0] == "<")) and not is_excluded(p):
+                                    reached.add(o)
+                        # Unless IRI objects are followed, only bnodes can be reached from the
+                        # seeds: triples of other IRI subjects are never needed by the deep pass
+                        elif follow and (follow_iri_objects or s.startswith("_:")):
+                            # Subjects and predicates repeat from triple to triple: interned, pickle
+                            # stores each once per batch (memo reference) and the deep pass
+                            # unpickles them as shared objects
+                            cache_append((intern(s), intern(p), o))
+                            if len(cache_batch) >= PARSED_CACHE_BATCH:
+                                pickle.dump(cache_batch, cache_out, protocol=pickle.HIGHEST_PROTOCOL)
+                                cache_batch.clear()
+                    write_lines(attr_out, attr_lines)
+                    write_lines(rel_out, rel_lines)
+                    previous = line_count
+                    line_count += block_lines
+                    if progress_every and line_count // progress_every > previous // progress_every:
+                        print(
+                            f"[WDC] depth=0 range={start} lines={line_count} "
+                            f"attr={kept['attr']} rel={kept['rel']}",
+                            file=sys.stderr,
+                        )
+                if cache_batch:
+                    pickle.dump(cache_batch, cache_out, protocol=pickle.HIGHEST_PROTOCOL)
+            finally:
+                if cache_out is not None:
+                    cache_out.close()
+        return line_count, kept, reached
+
+
+_splitter = None
+
+
+def split_mp_context():
+    """
+    Fork where available: workers then inherit the splitter (seed set, masks, replace_map)
+    copy-on-write instead of unpickling their own copy, whatever the platform default is.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def _init_split_worker(splitter):
+    global _splitter
+    _splitter = splitter
+
+
+def _scan_split_range(*args):
+    return _splitter.scan_range(*args)
 
 
 def split_triples(
@@ -155,73 +587,141 @@ def split_triples(
     replace_map=None,
     progress_every=0,
     follow_iri_objects=False,
+    workers=None,
+    dedupe=False,
 ):
     os.makedirs(os.path.dirname(out_attr_path), exist_ok=True)
     os.makedirs(os.path.dirname(out_rel_path), exist_ok=True)
 
     keep_subjects = set(s for s in seed_subjects if s)
-    processed_subjects = set()
+    splitter = TripleSplitter(
+        keep_subjects,
+        max_depth != 0,
+        lowercase_wd=lowercase_wd,
+        mask_values=mask_values,
+        exclude_props=exclude_props,
+        exclude_prop_patterns=exclude_prop_patterns,
+        replace_map=replace_map,
+        progress_every=progress_every,
+        follow_iri_objects=follow_iri_objects,
+    )
+    workers = workers or os.cpu_count() or 1
+    ranges = split_byte_ranges(input_path, workers)
+    # Duplicates are dropped where the shards meet the outputs, so they are caught across ranges
+    out_seen = (set(), set()) if dedupe else (None, None)
 
-    with open(out_attr_path, "w", encoding="utf-8") as attr_out, \
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(out_rel_path) or ".") as shard_dir, \
+         open(out_attr_path, "w", encoding="utf-8") as attr_out, \
          open(out_rel_path, "w", encoding="utf-8") as rel_out:
+        # Single parse of the input, split in byte ranges scanned by worker processes: each
+        # range writes its seed (depth-0) triples to shards, spills the triples of the other
+        # subjects to a pickle cache and returns its followed object edges (bnodes, plus
+        # IRIs with follow_iri_objects).
+        shards = [
+            tuple(os.path.join(shard_dir, f"{kind}_{i}") for kind in ("attr", "rel", "cache"))
+            for i in range(len(ranges))
+        ]
+        if len(ranges) == 1:
+            results = [splitter.scan_range(input_path, *ranges[0], *shards[0])]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=split_mp_context(),
+                initializer=_init_split_worker,
+                initargs=(splitter,),
+            ) as executor:
+                futures = [
+                    executor.submit(_scan_split_range, input_path, start, end, *shard)
+                    for (start, end), shard in zip(ranges, shards)
+                ]
+                results = [future.result() for future in futures]
+
+        frontier = set()
+        line_count = 0
+        kept = {"attr": 0, "rel": 0}
+        for (attr_shard, rel_shard, _cache), (lines, shard_kept, reached) in zip(shards, results):
+            for shard_path, out, seen in zip((attr_shard, rel_shard), (attr_out, rel_out), out_seen):
+                with open(shard_path, "r", encoding="utf-8") as shard_f:
+                    copy_lines(shard_f, out, seen)
+                os.remove(shard_path)
+            line_count += lines
+            kept["attr"] += shard_kept["attr"]
+            kept["rel"] += shard_kept["rel"]
+            frontier |= reached
+        results.clear()
+        # The seed set doubles as the visited set of the expansion
+        visited = keep_subjects
+        frontier -= visited
+        print(
+            f"[WDC] depth=0 done lines={line_count} "
+            f"attr={kept['attr']} rel={kept['rel']} new_bnodes={len(frontier)}",
+            file=sys.stderr,
+        )
+
+        # Breadth-first expansion over the cache (the non-seed triples that can be reached:
+        # bnode subjects, or every subject with follow_iri_objects): one scan per depth writes
+        # the frontier's triples and collects the next frontier, so only the subjects reached
+        # so far are held in memory
+        collect_triple = splitter.triple_collector()
+        is_excluded = splitter.is_excluded
         depth = 0
-        while True:
-            if max_depth >= 0 and depth > max_depth:
-                break
-            targets = keep_subjects - processed_subjects
-            if not targets:
-                break
-            new_subjects = set()
-            with open(input_path, "r", encoding="utf-8") as f:
-                line_count = 0
-                kept_attr = 0
-                kept_rel = 0
-                for line in f:
-                    line_count += 1
-                    if progress_every and line_count % progress_every == 0:
-                        print(
-                            f"[WDC] depth={depth} lines={line_count} "
-                            f"attr={kept_attr} rel={kept_rel}",
-                            file=sys.stderr,
-                        )
-                    parsed = parse_nq_or_nt(line)
-                    if not parsed:
-                        continue
-                    s, p, o = parsed
-                    if s not in targets:
-                        continue
-                    if exclude_props and p in exclude_props:
-                        continue
-                    if exclude_prop_patterns and any(pat in p.lower() for pat in exclude_prop_patterns):
-                        continue
-                    if replace_map and s in replace_map:
-                        s = replace_map[s]
-                    if replace_map and (not o.startswith('"')) and o in replace_map:
-                        o = replace_map[o]
-                    s_out, p_out, o_out = transform_triple(s, p, o, lowercase_wd)
-                    if o.startswith('"'):
-                        o_out = clean_literal(o_out)
-                        if mask_values:
-                            lex = literal_lex(o_out)
-                            if lex in mask_values:
-                                continue
-                        attr_out.write(f"{s_out}\t{p_out}\t{o_out}\n")
-                        kept_attr += 1
-                    else:
-                        rel_out.write(f"{s_out}\t{p_out}\t{o_out}\n")
-                        kept_rel += 1
-                        if o.startswith("_:"):
-                            new_subjects.add(o)
-                        elif follow_iri_objects and o.startswith("<"):
-                            new_subjects.add(o)
-            processed_subjects.update(targets)
-            keep_subjects.update(new_subjects)
+        while frontier and (max_depth < 0 or depth < max_depth):
+            depth += 1
+            visited |= frontier
+            next_frontier = set()
+            attr_lines = []
+            rel_lines = []
+            kept = {"attr": 0, "rel": 0}
+            triple_count = 0
+            for _attr, _rel, cache_shard in shards:
+                for batch in iter_cached_batches(cache_shard):
+                    for s, p, o in batch:
+                        if s not in frontier:
+                            continue
+                        kind = collect_triple(s, p, o, attr_lines, rel_lines)
+                        if kind:
+                            kept[kind] += 1
+                        if o[0] != '"':
+                            if replace_map:
+                                o = replace_map.get(o, o)
+                            if (o.startswith("_:") or (follow_iri_objects and o[0] == "<")) \
+                                    and o not in visited and not is_excluded(p):
+                                next_frontier.add(o)
+                    write_lines(attr_out, attr_lines, out_seen[0])
+                    write_lines(rel_out, rel_lines, out_seen[1])
+                    previous = triple_count
+                    triple_count += len(batch)
+                    if progress_every and triple_count // progress_every > previous // progress_every:
+                        print(f"[WDC] depth={depth} triples={triple_count}", file=sys.stderr)
             print(
-                f"[WDC] depth={depth} done lines={line_count} "
-                f"attr={kept_attr} rel={kept_rel} new_bnodes={len(new_subjects)}",
+                f"[WDC] depth={depth} done attr={kept['attr']} rel={kept['rel']} "
+                f"new_bnodes={len(next_frontier)}",
                 file=sys.stderr,
             )
-            depth += 1
+            frontier = next_frontier
+
+
+def sparql_values(uris):
+    """VALUES terms for a batch of IRIs, built with one join instead of an f-string per IRI."""
+    return "<" + "> <".join(uris) + ">" if uris else ""
+
+
+# Replies that mean "this query is too big or too slow" (WDQS reports its query timeout as a
+# 500): the batch is split in two instead of being retried whole
+SPLIT_STATUSES = {413, 414, 500, 504}
+# Rate limiting: retried after the server's Retry-After delay when it sends one
+THROTTLE_STATUSES = {429, 503}
+
+
+def retry_wait(exc, attempt, backoff):
+    """Seconds to wait before retrying a failed SPARQL request."""
+    wait_s = backoff ** attempt
+    resp = getattr(exc, "response", None)
+    if resp is not None and resp.status_code in THROTTLE_STATUSES:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            wait_s = max(wait_s, int(retry_after))
+    return wait_s
 
 
 def batch_iter(items: List[str], size: int) -> Iterable[List[str]]:
@@ -231,22 +731,16 @@ def batch_iter(items: List[str], size: int) -> Iterable[List[str]]:
 
 def count_wdc_triples(input_path, subjects, exclude_props=None, exclude_prop_patterns=None, mask_values=None):
     counts = {s: 0 for s in subjects}
-    with open(input_path, "r", encoding="utf-8") as f:
-        for line in f:
-            parsed = parse_nq_or_nt(line)
-            if not parsed:
-                continue
-            s, p, o = parsed
+    for _block_lines, block_triples in iter_parsed_blocks(input_path, subjects=counts):
+        for s, p, o in block_triples:
             if s not in counts:
                 continue
             if exclude_props and p in exclude_props:
                 continue
             if exclude_prop_patterns and any(pat in p.lower() for pat in exclude_prop_patterns):
                 continue
-            if mask_values and o.startswith('"'):
-                lex = literal_lex(o)
-                if lex in mask_values:
-                    continue
+            if mask_values and o.startswith('"') and is_masked_literal(o, mask_values):
+                continue
             counts[s] += 1
     return counts
 
@@ -270,12 +764,13 @@ def build_wd_merge_map(wd_entities, wd_values):
     for ent, val in zip(wd_entities, wd_values):
         if not val:
             continue
-        value_to_ents.setdefault(val, set()).add(ent)
+        # A list is enough: a repeated entity is its own canonical or maps to the same one
+        value_to_ents.setdefault(val, []).append(ent)
     replace_map = {}
     for ents in value_to_ents.values():
         if len(ents) <= 1:
             continue
-        canonical = sorted(ents)[0]
+        canonical = min(ents)
         for ent in ents:
             if ent != canonical:
                 replace_map[ent] = canonical
@@ -283,6 +778,8 @@ def build_wd_merge_map(wd_entities, wd_values):
 
 
 def count_props_in_files(paths, exclude_props=None):
+    # Plain text iteration + split: on these short TSV lines neither a binary block read +
+    # bytes findall nor str.find slicing of the predicate measured faster
     counts = {}
     for path in paths:
         with open(path, "r", encoding="utf-8") as f:
@@ -406,49 +903,107 @@ def collect_wikidata_uris(attr_path, rel_path):
     return uris, prop_uri_map
 
 
-def fetch_wd_labels_descriptions(uris, endpoint, language, batch_size, sleep_s, timeout, retries, backoff):
-    headers = {
-        "Accept": "application/sparql-results+json",
-        "User-Agent": "beam-builder/1.0",
-    }
-    results = []
-    uris = list(uris)
-    for batch_idx, batch in enumerate(batch_iter(uris, batch_size), start=1):
-        values = " ".join(f"<{uri}>" for uri in batch)
-        query = (
-            "SELECT ?s ?label ?desc WHERE { "
-            f"VALUES ?s {{ {values} }} "
-            "OPTIONAL { ?s rdfs:label ?label FILTER(LANG(?label) = \"" + language + "\") } "
-            "OPTIONAL { ?s schema:description ?desc FILTER(LANG(?desc) = \"" + language + "\") } "
-            "}"
-        )
-        attempt = 0
-        while True:
-            try:
-                resp = requests.post(
-                    endpoint,
-                    data={"query": query},
-                    headers=headers,
-                    timeout=timeout,
-                )
-                resp.raise_for_status()
-                data = resp.json()
-                for row in data.get("results", {}).get("bindings", []):
-                    s = row["s"]["value"]
-                    if "label" in row:
-                        results.append((s, "http://www.w3.org/2000/01/rdf-schema#label", f"\"{row['label']['value']}\""))
-                    if "desc" in row:
-                        results.append((s, "http://schema.org/description", f"\"{row['desc']['value']}\""))
-                break
-            except requests.RequestException as exc:
-                attempt += 1
-                if attempt > retries:
-                    raise
-                wait_s = backoff ** attempt
-                print(f"[WD] label retry {attempt}/{retries} in {wait_s}s: {exc}", file=sys.stderr)
-                time.sleep(wait_s)
-        if sleep_s > 0:
-            time.sleep(sleep_s)
+class TripleColumns:
+    """
+    Append-only (s, p, o) store kept as parallel columns: two str lists and an array of ids
+    into a small predicate table, instead of one 3-tuple per triple. Iterates as (s, p, o).
+    """
+
+    def __init__(self):
+        self.subjects = []
+        self.objects = []
+        self.pred_ids = array("H")
+        self.pred_table = []
+        self.pred_index = {}
+
+    def append(self, s, p, o):
+        pred_id = self.pred_index.get(p)
+        if pred_id is None:
+            pred_id = self.pred_index[p] = len(self.pred_table)
+            self.pred_table.append(p)
+        self.subjects.append(s)
+        self.pred_ids.append(pred_id)
+        self.objects.append(o)
+
+    def __len__(self):
+        return len(self.subjects)
+
+    def __iter__(self):
+        return zip(self.subjects, map(self.pred_table.__getitem__, self.pred_ids), self.objects)
+
+
+def ordered_results(fn, jobs, workers):
+    """Yield fn(*job) for each job in order, with up to `workers` calls running at once."""
+    workers = max(1, workers)
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for job in jobs:
+            in_flight.append(executor.submit(fn, *job))
+            if len(in_flight) >= workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def label_batch(endpoint, batch, language, sleep_s, timeout, retries, backoff):
+    """Fetch the label/description triples of one batch of uris (with retries)."""
+    headers = {"Accept": "application/sparql-results+json"}
+    values = sparql_values(batch)
+    query = (
+        "SELECT ?s ?label ?desc WHERE { "
+        f"VALUES ?s {{ {values} }} "
+        "OPTIONAL { ?s rdfs:label ?label FILTER(LANG(?label) = \"" + language + "\") } "
+        "OPTIONAL { ?s schema:description ?desc FILTER(LANG(?desc) = \"" + language + "\") } "
+        "}"
+    )
+    attempt = 0
+    while True:
+        try:
+            resp = _SESSION.post(
+                endpoint,
+                data={"query": query},
+                headers=headers,
+                timeout=timeout,
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            batch_triples = []
+            for row in data.get("results", {}).get("bindings", []):
+                s = row["s"]["value"]
+                if "label" in row:
+                    batch_triples.append((s, "http://www.w3.org/2000/01/rdf-schema#label", f"\"{row['label']['value']}\""))
+                if "desc" in row:
+                    batch_triples.append((s, "http://schema.org/description", f"\"{row['desc']['value']}\""))
+            break
+        except requests.RequestException as exc:
+            attempt += 1
+            if attempt > retries:
+                raise
+            wait_s = retry_wait(exc, attempt, backoff)
+            print(f"[WD] label retry {attempt}/{retries} in {wait_s}s: {exc}", file=sys.stderr)
+            time.sleep(wait_s)
+    if sleep_s > 0:
+        time.sleep(sleep_s)
+    return batch_triples
+
+
+def iter_wd_labels_descriptions(uris, endpoint, language, batch_size, sleep_s, timeout, retries, backoff, workers=1):
+    """Yield the label/description triples of each batch of uris, in batch order, as batches complete."""
+    uris = list(dict.fromkeys(uris))
+    jobs = (
+        (endpoint, batch, language, sleep_s, timeout, retries, backoff)
+        for batch in batch_iter(uris, batch_size)
+    )
+    yield from ordered_results(label_batch, jobs, workers)
+
+
+def fetch_wd_labels_descriptions(uris, endpoint, language, batch_size, sleep_s, timeout, retries, backoff, workers=1):
+    results = TripleColumns()
+    for batch_triples in iter_wd_labels_descriptions(
+        uris, endpoint, language, batch_size, sleep_s, timeout, retries, backoff, workers
+    ):
+        for s, p, o in batch_triples:
+            results.append(s, p, o)
     return results
 
 
@@ -463,6 +1018,7 @@ def append_labels_descriptions(
     retries,
     backoff,
     lowercase_wd,
+    workers=1,
 ):
     uris, prop_uri_map = collect_wikidata_uris(attr_path, rel_path)
     if not uris and not prop_uri_map:
@@ -470,7 +1026,7 @@ def append_labels_descriptions(
     ent_to_prop = {}
     for prop_uri, ent_uri in prop_uri_map.items():
         ent_to_prop.setdefault(ent_uri, []).append(prop_uri)
-    triples = fetch_wd_labels_descriptions(
+    batches = iter_wd_labels_descriptions(
         uris,
         endpoint,
         language,
@@ -479,19 +1035,25 @@ def append_labels_descriptions(
         timeout,
         retries,
         backoff,
+        workers,
     )
+    # Each batch is appended (and flushed) as it arrives instead of holding every label in memory
+    lines = []
     with open(attr_path, "a", encoding="utf-8") as out:
-        for s, p, o in triples:
-            s_out, p_out, o_out = transform_triple(s, p, o, lowercase_wd)
-            o_out = clean_literal(o_out)
-            out.write(f"{s_out}\t{p_out}\t{o_out}\n")
-            for prop_uri in ent_to_prop.get(s, []):
-                s_prop, p_prop, o_prop = transform_triple(prop_uri, p, o, lowercase_wd)
-                o_prop = clean_literal(o_prop)
-                out.write(f"{s_prop}\t{p_prop}\t{o_prop}\n")
+        for batch_triples in batches:
+            for s, p, o in batch_triples:
+                s_out, p_out, o_out = transform_triple(s, p, o, lowercase_wd)
+                o_out = clean_literal(o_out)
+                lines.append(f"{s_out}\t{p_out}\t{o_out}\n")
+                for prop_uri in ent_to_prop.get(s, []):
+                    s_prop, p_prop, o_prop = transform_triple(prop_uri, p, o, lowercase_wd)
+                    o_prop = clean_literal(o_prop)
+                    lines.append(f"{s_prop}\t{p_prop}\t{o_prop}\n")
+            write_lines(out, lines)
+            out.flush()
 
 
-def fetch_wd_label_desc_map(uris, endpoint, language, batch_size, sleep_s, timeout, retries, backoff):
+def fetch_wd_label_desc_map(uris, endpoint, language, batch_size, sleep_s, timeout, retries, backoff, workers=1):
     triples = fetch_wd_labels_descriptions(
         uris,
         endpoint,
@@ -501,6 +1063,7 @@ def fetch_wd_label_desc_map(uris, endpoint, language, batch_size, sleep_s, timeo
         timeout,
         retries,
         backoff,
+        workers,
     )
     labels = {}
     for s, p, o in triples:
@@ -523,6 +1086,7 @@ def write_prop_stats(
     timeout,
     retries,
     backoff,
+    workers=1,
 ):
     counts = count_props_in_files([attr_path, rel_path])
     prop_entity_map = {}
@@ -543,6 +1107,7 @@ def write_prop_stats(
             timeout,
             retries,
             backoff,
+            workers,
         )
 
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
@@ -592,7 +1157,8 @@ def run_pipeline(
     out_prop_stats_wdc = os.path.join(out_dir, "prop_stats_wdc.tsv")
     out_prop_stats_wd = os.path.join(out_dir, "prop_stats_wd.tsv")
 
-    wd_entities_out = [normalize_wd_uri(replace_map.get(uri, uri), lowercase_wd) for uri in wd_entities_raw]
+    # Normalized lazily: write_links zips it with wdc_entities, so no second list of every link
+    wd_entities_out = (normalize_wd_uri(replace_map.get(uri, uri), lowercase_wd) for uri in wd_entities_raw)
     write_links(out_links, wdc_entities, wd_entities_out, args.dedupe_links)
 
     split_triples(
@@ -606,6 +1172,8 @@ def run_pipeline(
         exclude_prop_patterns=wdc_exclude_prop_patterns,
         progress_every=args.progress_every,
         follow_iri_objects=True,
+        workers=args.workers,
+        dedupe=args.dedupe_triples,
     )
 
     if args.wd_nq:
@@ -624,6 +1192,8 @@ def run_pipeline(
             mask_values=wd_mask_values,
             exclude_props=wd_exclude_props,
             replace_map=replace_map,
+            workers=args.workers,
+            dedupe=args.dedupe_triples,
         )
         if args.wd_prop_min_count > 0:
             filter_triples_by_prop_count(
@@ -646,6 +1216,7 @@ def run_pipeline(
                 args.retries,
                 args.backoff,
                 lowercase_wd,
+                workers=args.wd_workers,
             )
     else:
         wd_attr_tmp = out_attr_2
@@ -670,6 +1241,9 @@ def run_pipeline(
             replace_map=replace_map,
             state_path=args.state_file or os.path.join(out_dir, ".wd_state.json"),
             resume=args.resume,
+            workers=args.wd_workers,
+            dedupe=args.dedupe_triples,
+            cache_dir=args.sparql_cache_dir,
         )
         if args.wd_prop_min_count > 0:
             filter_triples_by_prop_count(
@@ -692,6 +1266,7 @@ def run_pipeline(
                 args.retries,
                 args.backoff,
                 lowercase_wd,
+                workers=args.wd_workers,
             )
     write_prop_stats_simple(out_prop_stats_wdc, out_attr_1, out_rel_1)
     write_prop_stats(
@@ -705,7 +1280,92 @@ def run_pipeline(
         args.timeout,
         args.retries,
         args.backoff,
+        workers=args.wd_workers,
     )
+def construct_cache_path(cache_dir, endpoint, language, batch):
+    """Reply cache file of one CONSTRUCT batch, keyed by its content rather than its position."""
+    key = "\n".join([endpoint, language, *sorted(batch)])
+    return os.path.join(cache_dir, hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + ".nt.gz")
+
+
+def construct_batch(endpoint, batch_idx, batch, language, sleep_s, timeout, retries, backoff, cache_dir=None):
+    """
+    Run the CONSTRUCT query of one batch (with retries) and return (batch_idx, parsed triples).
+    With `cache_dir`, a batch already fetched by an earlier run is read back from disk instead.
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = construct_cache_path(cache_dir, endpoint, language, batch)
+        try:
+            with gzip.open(cache_path, "rb") as f:
+                body = f.read()
+            return batch_idx, NQ_BLOCK_RE.findall(decode_lines(body, errors="replace"))
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError) as exc:
+            print(f"[WD] ignoring unreadable cache file {cache_path}: {exc}", file=sys.stderr)
+    headers = {"Accept": "application/n-triples"}
+    values = sparql_values(batch)
+    query = (
+        "CONSTRUCT { ?s ?p ?o . } WHERE { "
+        f"VALUES ?s {{ {values} }} "
+        "?s ?p ?o . "
+        "FILTER(!isLiteral(?o) || lang(?o) = \"\" "
+        f"|| langMatches(lang(?o), \"{language}\")) "
+        "}"
+    )
+    print(f"[WD] batch {batch_idx} size={len(batch)}", file=sys.stderr)
+    attempt = 0
+    while True:
+        try:
+            resp = _SESSION.post(
+                endpoint,
+                data={"query": query},
+                headers=headers,
+                timeout=timeout,
+            )
+            resp.raise_for_status()
+            # N-Triples is UTF-8 by definition: decode the body directly (resp.text would guess the
+            # charset of an application/n-triples reply) and parse it with one findall
+            body = resp.content
+            triples = NQ_BLOCK_RE.findall(decode_lines(body, errors="replace"))
+            break
+        except requests.RequestException as exc:
+            status = exc.response.status_code if exc.response is not None else None
+            if (len(batch) > 1 and attempt >= min(1, retries)
+                    and (status in SPLIT_STATUSES or isinstance(exc, requests.Timeout))):
+                # Still too heavy after a retry: query both halves separately (each caches its own
+                # reply and keeps the per-request pause, so splitting doesn't burst the endpoint)
+                half = len(batch) // 2
+                print(f"[WD] batch {batch_idx}: {exc}; splitting into {half} + {len(batch) - half}", file=sys.stderr)
+                triples = []
+                for part in (batch[:half], batch[half:]):
+                    triples.extend(
+                        construct_batch(
+                            endpoint, batch_idx, part, language, sleep_s, timeout, retries, backoff, cache_dir
+                        )[1]
+                    )
+                # Cached as one reply too, so a rerun never sends the heavy batch again
+                body = "".join(f"{s} {p} {o} .\n" for s, p, o in triples).encode("utf-8")
+                break
+            attempt += 1
+            if attempt > retries:
+                raise
+            wait_s = retry_wait(exc, attempt, backoff)
+            print(f"[WD] retry {attempt}/{retries} in {wait_s}s: {exc}", file=sys.stderr)
+            time.sleep(wait_s)
+    if cache_path:
+        # Written under a temporary name and renamed, so a crash never leaves a truncated reply
+        tmp_path = f"{cache_path}.{os.getpid()}.{batch_idx}.tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, cache_path)
+    # The pause is per worker, so each connection stays as polite as the serial loop was
+    if sleep_s > 0:
+        time.sleep(sleep_s)
+    return batch_idx, triples
+
+
 def sparql_construct(
     endpoint,
     subjects,
@@ -716,49 +1376,45 @@ def sparql_construct(
     retries,
     backoff,
     start_batch,
+    workers=1,
+    cache_dir=None,
 ):
-    headers = {
-        "Accept": "application/n-triples",
-        "User-Agent": "beam-builder/1.0",
-    }
-    for batch_idx, batch in enumerate(batch_iter(subjects, batch_size), start=1):
-        if batch_idx < start_batch:
-            continue
-        values = " ".join(f"<{uri}>" for uri in batch)
-        query = (
-            "CONSTRUCT { ?s ?p ?o . } WHERE { "
-            f"VALUES ?s {{ {values} }} "
-            "?s ?p ?o . "
-            "FILTER(!isLiteral(?o) || lang(?o) = \"\" "
-            f"|| langMatches(lang(?o), \"{language}\")) "
-            "}"
-        )
-        print(f"[WD] batch {batch_idx} size={len(batch)}", file=sys.stderr)
-        attempt = 0
-        while True:
-            try:
-                resp = requests.post(
-                    endpoint,
-                    data={"query": query},
-                    headers=headers,
-                    timeout=timeout,
-                )
-                resp.raise_for_status()
-                for line in resp.text.splitlines():
-                    parsed = parse_nq_or_nt(line)
-                    if parsed:
-                        yield batch_idx, parsed
-                yield batch_idx, None
-                break
-            except requests.RequestException as exc:
-                attempt += 1
-                if attempt > retries:
-                    raise
-                wait_s = backoff ** attempt
-                print(f"[WD] retry {attempt}/{retries} in {wait_s}s: {exc}", file=sys.stderr)
-                time.sleep(wait_s)
-        if sleep_s > 0:
-            time.sleep(sleep_s)
+    """
+    Yield (batch_idx, triple) for every triple of every batch, then (batch_idx, None) once the
+    batch is complete. Up to `workers` batches are in flight, but results come out in batch order.
+    """
+    jobs = (
+        (endpoint, batch_idx, batch, language, sleep_s, timeout, retries, backoff, cache_dir)
+        for batch_idx, batch in enumerate(batch_iter(subjects, batch_size), start=1)
+        if batch_idx >= start_batch
+    )
+    for batch_idx, triples in ordered_results(construct_batch, jobs, workers):
+        for parsed in triples:
+            yield batch_idx, parsed
+        yield batch_idx, None
+
+
+def load_resume_state(state_path):
+    """(run parameters, last completed batch) recorded in a resume state file."""
+    with open(state_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        # State written by earlier versions: a single JSON object rewritten after every batch
+        header = json.loads(text)
+        return header, int(header.get("done_batch", 0))
+    except ValueError:
+        pass
+    first, _, rest = text.partition("\n")
+    try:
+        header = json.loads(first)
+    except ValueError:
+        header = {}
+    done_batch = 0
+    for line in rest.splitlines(keepends=True):
+        # A torn last line (no newline) is ignored
+        if line.endswith("\n") and line.strip().isdigit():
+            done_batch = int(line)
+    return header, done_batch
 
 
 def write_wikidata_from_sparql(
@@ -778,27 +1434,50 @@ def write_wikidata_from_sparql(
     replace_map=None,
     state_path=None,
     resume=False,
+    workers=1,
+    dedupe=False,
+    cache_dir=None,
 ):
     os.makedirs(os.path.dirname(out_attr_path), exist_ok=True)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
     os.makedirs(os.path.dirname(out_rel_path), exist_ok=True)
+    # Link files map many WDC entities to the same Wikidata entity: query each subject once
+    subjects = list(dict.fromkeys(subjects))
     start_batch = 1
     state = {
-        "done_batch": 0,
         "batch_size": batch_size,
         "lang": language,
         "endpoint": endpoint,
         "total_subjects": len(subjects),
     }
     if resume and state_path and os.path.exists(state_path):
-        with open(state_path, "r", encoding="utf-8") as f:
-            prev = json.load(f)
-        start_batch = int(prev.get("done_batch", 0)) + 1
+        prev, done_batch = load_resume_state(state_path)
+        for key in ("batch_size", "total_subjects"):
+            if key in prev and prev[key] != state[key]:
+                # Other batch boundaries: resuming would skip or repeat subjects. State files
+                # written before subjects were deduplicated count repeated entities too.
+                raise SystemExit(
+                    f"[WD] error: state file {state_path} has {key}={prev[key]} but this run has "
+                    f"{state[key]}; its batches don't line up with this run. Rerun without --resume."
+                )
+        start_batch = done_batch + 1
         print(f"[WD] resuming from batch {start_batch}", file=sys.stderr)
 
     attr_mode = "a" if resume else "w"
     rel_mode = "a" if resume else "w"
+    state_out = None
+    if state_path:
+        # Rewritten once per run (header + current position), then one line appended per batch
+        state_out = open(state_path, "w", encoding="utf-8", buffering=1)
+        state_out.write(json.dumps(state) + "\n")
+        state_out.write(f"{start_batch - 1}\n")
     with open(out_attr_path, attr_mode, encoding="utf-8") as attr_out, \
          open(out_rel_path, rel_mode, encoding="utf-8") as rel_out:
+        attr_lines = []
+        rel_lines = []
+        # Merged (replace_map) or lowercased entities can repeat the same output line across batches
+        attr_seen, rel_seen = (set(), set()) if dedupe else (None, None)
         kept_attr = 0
         kept_rel = 0
         for batch_idx, item in sparql_construct(
@@ -811,12 +1490,17 @@ def write_wikidata_from_sparql(
             retries,
             backoff,
             start_batch,
+            workers,
+            cache_dir,
         ):
             if item is None:
-                if state_path:
-                    state["done_batch"] = batch_idx
-                    with open(state_path, "w", encoding="utf-8") as f:
-                        json.dump(state, f, indent=2)
+                # Flush the batch before recording it as done so a resume never skips lines
+                write_lines(attr_out, attr_lines, attr_seen)
+                write_lines(rel_out, rel_lines, rel_seen)
+                if state_out is not None:
+                    attr_out.flush()
+                    rel_out.flush()
+                    state_out.write(f"{batch_idx}\n")
                 continue
             s, p, o = item
             if exclude_props and p in exclude_props:
@@ -827,16 +1511,18 @@ def write_wikidata_from_sparql(
                 o = replace_map[o]
             s_out, p_out, o_out = transform_triple(s, p, o, lowercase_wd)
             if o.startswith('"'):
-                o_out = clean_literal(o_out)
-                if mask_values:
-                    lex = literal_lex(o_out)
-                    if lex in mask_values:
-                        continue
-                attr_out.write(f"{s_out}\t{p_out}\t{o_out}\n")
+                o_out, lex = clean_literal_lex(o_out)
+                if mask_values and lex in mask_values:
+                    continue
+                attr_lines.append(f"{s_out}\t{p_out}\t{o_out}\n")
                 kept_attr += 1
             else:
-                rel_out.write(f"{s_out}\t{p_out}\t{o_out}\n")
+                rel_lines.append(f"{s_out}\t{p_out}\t{o_out}\n")
                 kept_rel += 1
+        write_lines(attr_out, attr_lines, attr_seen)
+        write_lines(rel_out, rel_lines, rel_seen)
+        if state_out is not None:
+            state_out.close()
         print(f"[WD] done attr={kept_attr} rel={kept_rel}", file=sys.stderr)
 
 
@@ -855,7 +1541,9 @@ def main():
     parser.add_argument("--wd-value-col", type=int, help="0-based column index for wiki_value.")
     parser.add_argument("--max-depth", type=int, default=1, help="Depth for following bnodes (default: 1, -1 means until no new bnodes).")
     parser.add_argument("--dedupe-links", action="store_true", help="Remove duplicate ent_links pairs.")
+    parser.add_argument("--dedupe-triples", action="store_true", help="Drop repeated attr/rel output lines.")
     parser.add_argument("--progress-every", type=int, default=0, help="Print progress every N lines (WDC scan).")
+    parser.add_argument("--workers", type=int, default=0, help="Processes for the N-Quads scans (default: CPU count).")
     parser.add_argument("--keep-link-values", action="store_true", help="Do not mask link values in triples.")
     parser.add_argument("--wdc-min-triples", type=int, default=0, help="Minimum triples per WDC entity.")
     parser.add_argument("--wdc-exclude-prop", action="append", default=[], help="Exclude WDC predicate URI (repeatable).")
@@ -869,12 +1557,14 @@ def main():
     parser.add_argument("--lang", default="en", help="Language filter for literals with language tag.")
     parser.add_argument("--batch-size", type=int, default=50, help="Wikidata SPARQL batch size.")
     parser.add_argument("--sleep", type=float, default=1.0, help="Sleep between SPARQL batches in seconds.")
+    parser.add_argument("--wd-workers", type=int, default=4, help="Wikidata SPARQL batches (CONSTRUCT and label queries) in flight at once.")
     parser.add_argument("--timeout", type=int, default=60, help="SPARQL request timeout in seconds.")
     parser.add_argument("--retries", type=int, default=3, help="SPARQL retries per batch.")
     parser.add_argument("--backoff", type=float, default=2.0, help="Exponential backoff base (seconds).")
     parser.add_argument("--no-lowercase-wd", action="store_true", help="Do not lowercase Wikidata URIs.")
     parser.add_argument("--resume", action="store_true", help="Resume Wikidata SPARQL extraction.")
     parser.add_argument("--state-file", help="Path to resume state file (default: OUT_DIR/.wd_state.json).")
+    parser.add_argument("--sparql-cache-dir", help="Keep Wikidata CONSTRUCT replies here (gzipped, keyed by batch content) and reuse them.")
 
     args = parser.parse_args()
 
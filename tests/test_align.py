@@ -0,0 +1,83 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import align  # noqa: E402
+
+MIN_LENGTH = 8
+
+
+def pairwise_candidates(wdc_norm, wikidata_map):
+    """The original fuzzy_link scan: every long enough key sharing the shorter key's prefix."""
+    candidates = []
+    for wiki_norm in wikidata_map:
+        if len(wiki_norm) < MIN_LENGTH:
+            continue
+        min_len = min(len(wdc_norm), len(wiki_norm))
+        if wdc_norm[:min_len] == wiki_norm[:min_len]:
+            candidates.append(wiki_norm)
+    return candidates
+
+
+def random_keys(rng, n):
+    # A two-letter alphabet makes shared prefixes (and equal keys) common
+    return ["".join(rng.choice("ab") for _ in range(rng.randint(4, 14))) for _ in range(n)]
+
+
+def fuzzy_index(wikidata_map):
+    wiki_sorted = sorted(wiki_norm for wiki_norm in wikidata_map if len(wiki_norm) >= MIN_LENGTH)
+    wiki_order = {wiki_norm: i for i, wiki_norm in enumerate(wikidata_map)}
+    return wiki_sorted, wiki_order
+
+
+def test_prefix_candidates_match_pairwise_scan():
+    rng = random.Random(0)
+    for _ in range(20):
+        wikidata_map = dict.fromkeys(random_keys(rng, 300))
+        wiki_sorted, wiki_order = fuzzy_index(wikidata_map)
+        for wdc_norm in random_keys(rng, 100):
+            if len(wdc_norm) < MIN_LENGTH:
+                continue
+            assert align.prefix_candidates(wdc_norm, wiki_sorted, wiki_order, MIN_LENGTH) == \
+                pairwise_candidates(wdc_norm, wikidata_map)
+
+
+def test_iter_prefix_candidates_parallel_keeps_order(monkeypatch):
+    monkeypatch.setattr(align, "FUZZY_PARALLEL_MIN_KEYS", 1)
+    monkeypatch.setattr(align, "FUZZY_CHUNK_SIZE", 7)
+    rng = random.Random(1)
+    wikidata_map = dict.fromkeys(random_keys(rng, 300))
+    wiki_sorted, wiki_order = fuzzy_index(wikidata_map)
+    wdc_keys = [key for key in random_keys(rng, 100) if len(key) >= MIN_LENGTH]
+    got = list(align.iter_prefix_candidates(wdc_keys, wiki_sorted, wiki_order, MIN_LENGTH, workers=3))
+    assert got == [pairwise_candidates(key, wikidata_map) for key in wdc_keys]
+
+
+def test_filter_by_patterns_skips_corrupt_gz_part(tmp_path):
+    import gzip
+
+    good = tmp_path / "part_0.gz"
+    with gzip.open(good, "wb") as f:
+        f.write(b'_:a <http://schema.org/isrcCode> "X" <http://g> .\n'
+                b'_:a <http://schema.org/name> "N" <http://g> .\n')
+    corrupt = tmp_path / "part_1.gz"
+    corrupt.write_bytes(good.read_bytes()[:20])
+    output = tmp_path / "filtered.nq"
+    matched = align.filter_by_pattern([corrupt, good], "isrc", output, workers=2)
+    assert matched == 1
+    assert output.read_bytes() == b'_:a <http://schema.org/isrcCode> "X" <http://g> .\n'
+
+
+def test_count_filtered_lines_ignores_stale_meta(tmp_path):
+    filtered = tmp_path / "isrc_filtered.nq"
+    filtered.write_bytes(b"a\nb\n")
+    align.filtered_meta_path(filtered).write_text('{"matched": 2, "total": 9, "size": 4}', encoding="utf-8")
+    assert align.count_filtered_lines(filtered) == 2
+    # Regenerated by other means: the metadata no longer describes the file
+    filtered.write_bytes(b"a\nb\nc")
+    assert align.count_filtered_lines(filtered) == 3
+    # Metadata written before sizes were recorded
+    align.filtered_meta_path(filtered).write_text('{"matched": 2, "total": 9}', encoding="utf-8")
+    assert align.count_filtered_lines(filtered) == 3
@@ -0,0 +1,185 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import build_beam_files  # noqa: E402
+
+
+def test_read_links_ragged_first_row(tmp_path):
+    path = tmp_path / "links.tsv"
+    path.write_text('<x>\t<y>\n<a>\t<b>\t"v"\n', encoding="utf-8")
+    links = build_beam_files.read_links(str(path), "\t", 0, 1, 2, None)
+    assert links == (["<x>", "<a>"], ["<y>", "<b>"], ["", '"v"'], [])
+
+
+def test_read_links_multichar_separator_falls_back(tmp_path):
+    path = tmp_path / "links.tsv"
+    path.write_text('<x>||<y>\n<a>||<b>||"v"||extra\n', encoding="utf-8")
+    links = build_beam_files.read_links(str(path), "||", 0, 1, 2, None)
+    assert links == (["<x>", "<a>"], ["<y>", "<b>"], ["", '"v"'], [])
+
+
+def per_depth_split(input_path, seed_subjects, max_depth, replace_map=None, follow_iri_objects=False):
+    """The original split_triples: one full pass over the input per depth."""
+    keep_subjects = set(seed_subjects)
+    processed_subjects = set()
+    attr, rel = [], []
+    depth = 0
+    while max_depth < 0 or depth <= max_depth:
+        targets = keep_subjects - processed_subjects
+        if not targets:
+            break
+        new_subjects = set()
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line in f:
+                parsed = build_beam_files.parse_nq_or_nt(line)
+                if not parsed or parsed[0] not in targets:
+                    continue
+                s, p, o = parsed
+                if replace_map:
+                    s = replace_map.get(s, s)
+                    if not o.startswith('"'):
+                        o = replace_map.get(o, o)
+                if o.startswith('"'):
+                    attr.append(f"{s}\t{p}\t{build_beam_files.clean_literal(o)}\n")
+                else:
+                    rel.append(f"{s}\t{p}\t{o}\n")
+                    if o.startswith("_:") or (follow_iri_objects and o.startswith("<")):
+                        new_subjects.add(o)
+        processed_subjects.update(targets)
+        keep_subjects.update(new_subjects)
+        depth += 1
+    return "".join(attr), "".join(rel)
+
+
+def write_graph(path):
+    # A bnode chain from <s1>, a cycle back to a seed, an IRI object with its own triples and
+    # triples no seed reaches
+    lines = []
+    for i in range(60):
+        lines.append(f'<s{i % 3}> <p> "v{i}" <g> .\n')
+        lines.append(f"<s{i % 3}> <p> _:b{i} <g> .\n")
+        lines.append(f"_:b{i} <q> _:c{i} <g> .\n")
+        lines.append(f'_:c{i} <q> "deep{i}" <g> .\n')
+        lines.append(f"_:c{i} <q> <s0> <g> .\n")
+        lines.append(f"<s1> <r> <o{i}> <g> .\n")
+        lines.append(f'<o{i}> <r> "iri{i}" <g> .\n')
+        lines.append(f"<o{i}> <r> _:d{i} <g> .\n")
+        lines.append(f'_:d{i} <r> "d{i}" <g> .\n')
+        lines.append(f"<x{i}> <r> _:e{i} <g> .\n")
+        lines.append(f'_:e{i} <r> "unreached{i}" <g> .\n')
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def test_split_triples_matches_per_depth_loop(tmp_path):
+    graph = tmp_path / "graph.nq"
+    write_graph(graph)
+    seeds = ["<s0>", "<s1>"]
+    for follow_iri_objects in (False, True):
+        for max_depth in (0, 1, 2, -1):
+            expected = per_depth_split(str(graph), seeds, max_depth, follow_iri_objects=follow_iri_objects)
+            for workers in (1, 3):
+                attr_path = tmp_path / "out" / "attr"
+                rel_path = tmp_path / "out" / "rel"
+                build_beam_files.split_triples(
+                    str(graph), str(attr_path), str(rel_path), seeds, max_depth,
+                    follow_iri_objects=follow_iri_objects, workers=workers,
+                )
+                got = (attr_path.read_text(encoding="utf-8"), rel_path.read_text(encoding="utf-8"))
+                assert got == expected, (follow_iri_objects, max_depth, workers)
+
+
+def test_split_triples_applies_replace_map_before_following(tmp_path):
+    graph = tmp_path / "graph.nq"
+    write_graph(graph)
+    replace_map = {"_:b1": "_:c5", "<s2>": "<s0>"}
+    expected = per_depth_split(str(graph), ["<s1>", "<s2>"], -1, replace_map=replace_map)
+    attr_path = tmp_path / "out" / "attr"
+    rel_path = tmp_path / "out" / "rel"
+    build_beam_files.split_triples(
+        str(graph), str(attr_path), str(rel_path), ["<s1>", "<s2>"], -1, replace_map=replace_map, workers=2,
+    )
+    assert (attr_path.read_text(encoding="utf-8"), rel_path.read_text(encoding="utf-8")) == expected
+
+
+def test_load_resume_state_ignores_torn_last_line(tmp_path):
+    state_path = tmp_path / "state"
+    state_path.write_text('{"batch_size": 50, "total_subjects": 120}\n0\n1\n2\n3', encoding="utf-8")
+    header, done_batch = build_beam_files.load_resume_state(str(state_path))
+    assert header == {"batch_size": 50, "total_subjects": 120}
+    assert done_batch == 2
+
+
+def test_load_resume_state_reads_legacy_json(tmp_path):
+    state_path = tmp_path / "state"
+    state_path.write_text('{"batch_size": 50, "total_subjects": 120, "done_batch": 7}', encoding="utf-8")
+    header, done_batch = build_beam_files.load_resume_state(str(state_path))
+    assert header["batch_size"] == 50
+    assert done_batch == 7
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise build_beam_files.requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+def overloaded_endpoint(max_subjects, calls):
+    """A CONSTRUCT endpoint that answers 500 to any batch of more than max_subjects subjects."""
+
+    def post(endpoint, data, headers, timeout):
+        subjects = data["query"].split("VALUES ?s { ")[1].split(" }")[0].split()
+        calls.append(len(subjects))
+        if len(subjects) > max_subjects:
+            return FakeResponse(500)
+        body = "".join(f'{s} <http://p> "{s[1:-1]}" .\n' for s in subjects)
+        return FakeResponse(200, body.encode("utf-8"))
+
+    return post
+
+
+def test_construct_batch_retries_then_splits(monkeypatch):
+    calls = []
+    sleeps = []
+    monkeypatch.setattr(build_beam_files._SESSION, "post", overloaded_endpoint(2, calls))
+    monkeypatch.setattr(build_beam_files.time, "sleep", sleeps.append)
+    batch = [f"http://e/{i}" for i in range(5)]
+    batch_idx, triples = build_beam_files.construct_batch("http://wdqs", 3, batch, "en", 0.5, 10, 3, 2)
+    assert batch_idx == 3
+    assert [s for s, _p, _o in triples] == [f"<{uri}>" for uri in batch]
+    # The full batch is retried once before splitting; each half retries and splits in turn
+    assert calls[:2] == [5, 5]
+    assert sorted(n for n in calls if n <= 2) == [1, 2, 2]
+    assert 0.5 in sleeps
+
+
+def test_construct_batch_caches_split_batch_whole(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(build_beam_files._SESSION, "post", overloaded_endpoint(2, calls))
+    monkeypatch.setattr(build_beam_files.time, "sleep", lambda _s: None)
+    batch = [f"http://e/{i}" for i in range(5)]
+    _idx, triples = build_beam_files.construct_batch("http://wdqs", 1, batch, "en", 0, 10, 3, 2, str(tmp_path))
+    calls.clear()
+    _idx, cached = build_beam_files.construct_batch("http://wdqs", 1, batch, "en", 0, 10, 3, 2, str(tmp_path))
+    assert calls == []
+    assert cached == triples
+
+
+def test_resume_refuses_state_with_other_batch_boundaries(tmp_path):
+    state_path = tmp_path / "state"
+    # Written before subjects were deduplicated: 4 subjects, two of them repeated
+    state_path.write_text('{"batch_size": 2, "total_subjects": 4}\n1\n', encoding="utf-8")
+    with pytest.raises(SystemExit, match="Rerun without --resume"):
+        build_beam_files.write_wikidata_from_sparql(
+            "http://wdqs", ["a", "b", "a", "b"], str(tmp_path / "attr"), str(tmp_path / "rel"),
+            False, "en", 2, 0, 10, 0, 2, state_path=str(state_path), resume=True,
+        )
+    assert state_path.read_text(encoding="utf-8") == '{"batch_size": 2, "total_subjects": 4}\n1\n'